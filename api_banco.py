@@ -7,18 +7,31 @@ Desenvolvido com Flask - API moderna e segura
 from flask import Flask, request, jsonify, render_template_string
 from flask_cors import CORS
 from banco_db import BancoDados
-from main import ContaBancaria
 import jwt
 import datetime
+import math
 from functools import wraps
+import atexit
 import os
+import threading
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'banco-seguro-jwt-secret-key-2024'
 CORS(app)
 
-# Inicializar banco
-banco = BancoDados()
+# Banco criado no primeiro uso (pool de conexões compartilhado entre as threads do Flask): importar
+# o módulo não abre o banco - os workers do pool de hash de senhas reimportam o script principal
+banco = None
+_trava_banco = threading.Lock()
+
+def obter_banco():
+    """Retorna o BancoDados da API, criando-o na primeira chamada"""
+    global banco
+    with _trava_banco:
+        if banco is None:
+            banco = BancoDados()
+            atexit.register(banco.fechar)
+        return banco
 
 # Decorator para verificar JWT
 def token_required(f):
@@ -124,10 +137,17 @@ def home():
                 <strong>Response:</strong> {"sucesso": true, "novo_saldo": 1300.50, "mensagem": "Saque realizado"}
             </div>
 
+            <div class="endpoint">
+                <span class="method post">POST</span>
+                <code>/api/transferencia</code><br>
+                <strong>Body:</strong> {"conta_destino": "12345678", "valor": 150.0}<br>
+                <strong>Response:</strong> {"sucesso": true, "novo_saldo": 1150.50, "mensagem": "Transferência realizada"}
+            </div>
+
             <div class="endpoint">
                 <span class="method get">GET</span>
-                <code>/api/historico</code><br>
-                <strong>Response:</strong> {"transacoes": [...], "total": 10}
+                <code>/api/historico?limite=50&amp;antes_de={cursor}&amp;data_inicio=AAAA-MM-DD&amp;data_fim=AAAA-MM-DD</code><br>
+                <strong>Response:</strong> {"transacoes": [...], "total": 10, "proximo_cursor": "..."}
             </div>
 
             <h2>👨‍💼 Administração</h2>
@@ -146,6 +166,13 @@ def home():
                 <strong>Response:</strong> {"logs": [...]}
             </div>
 
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/api/admin/metricas</code><br>
+                <strong>Header:</strong> Admin-Token: admin123<br>
+                <strong>Response:</strong> {"travas": {"aquisicoes": 120, "contencoes": 3, ...}}
+            </div>
+
             <h2>📱 Exemplo de uso (JavaScript)</h2>
             <pre style="background: #f8f9fa; padding: 15px; border-radius: 5px; overflow-x: auto;">
 // 1. Login
@@ -187,7 +214,7 @@ def login():
             return jsonify({'erro': 'Nome e senha são obrigatórios'}), 400
         
         # Tentar autenticar
-        conta_data, mensagem = banco.autenticar_usuario(nome, senha)
+        conta_data, mensagem = obter_banco().autenticar_usuario(nome, senha)
         
         if conta_data:
             # Gerar JWT token
@@ -197,7 +224,7 @@ def login():
             }, app.config['SECRET_KEY'], algorithm='HS256')
             
             # Mascarar dados sensíveis
-            numero_mascarado = banco.seguranca.mascarar_dados_sensveis(conta_data['numero_conta'], "conta")
+            numero_mascarado = obter_banco().seguranca.mascarar_dados_sensveis(conta_data['numero_conta'], "conta")
             
             return jsonify({
                 'sucesso': True,
@@ -231,7 +258,7 @@ def cadastro():
             return jsonify({'erro': 'Senha deve ter pelo menos 6 caracteres'}), 400
         
         # Tentar criar conta
-        conta_id, resultado = banco.criar_conta(nome, senha, saldo_inicial)
+        conta_id, resultado = obter_banco().criar_conta(nome, senha, saldo_inicial)
         
         if conta_id:
             return jsonify({
@@ -252,16 +279,16 @@ def cadastro():
 def obter_saldo(user_id):
     """Obter saldo da conta"""
     try:
-        conta_data = banco.buscar_conta_por_id(user_id)
-        if not conta_data:
+        conta_data = obter_banco().buscar_conta_por_id(user_id)
+        if not conta_data or conta_data['saldo'] is None:
             return jsonify({'erro': 'Conta não encontrada'}), 404
         
-        numero_mascarado = banco.seguranca.mascarar_dados_sensveis(conta_data['numero_conta'], "conta")
+        numero_mascarado = obter_banco().seguranca.mascarar_dados_sensveis(conta_data['numero_conta'], "conta")
         
         return jsonify({
             'saldo': conta_data['saldo'],
             'numero_conta_mascarado': numero_mascarado,
-            'titular_mascarado': banco.seguranca.mascarar_dados_sensveis(conta_data['titular'], "nome")
+            'titular_mascarado': obter_banco().seguranca.mascarar_dados_sensveis(conta_data['titular'], "nome")
         })
         
     except Exception as e:
@@ -275,29 +302,23 @@ def fazer_deposito(user_id):
         data = request.get_json()
         valor = float(data.get('valor', 0))
         
-        if valor <= 0:
+        if not math.isfinite(valor) or valor <= 0:
             return jsonify({'erro': 'Valor deve ser positivo'}), 400
         
         if valor > 1000000:
             return jsonify({'erro': 'Valor máximo é R$ 1.000.000'}), 400
         
-        # Obter conta
-        conta_data = banco.buscar_conta_por_id(user_id)
-        if not conta_data:
-            return jsonify({'erro': 'Conta não encontrada'}), 404
-        
-        # Criar objeto conta e fazer depósito
-        conta = ContaBancaria(conta_data, banco)
-        conta.depositar(valor)
-        
-        # Obter novo saldo
-        conta.atualizar_saldo_local()
+        # Depósito atômico: lê, atualiza e registra em uma única transação
+        novo_saldo, mensagem = obter_banco().depositar(user_id, valor)
+        if novo_saldo is None:
+            codigo = 404 if mensagem == 'Conta não encontrada' else 400
+            return jsonify({'erro': mensagem}), codigo
         
         return jsonify({
             'sucesso': True,
-            'novo_saldo': conta.saldo,
+            'novo_saldo': novo_saldo,
             'valor_depositado': valor,
-            'mensagem': f'Depósito de R$ {valor:.2f} realizado com sucesso'
+            'mensagem': mensagem
         })
         
     except Exception as e:
@@ -311,40 +332,106 @@ def fazer_saque(user_id):
         data = request.get_json()
         valor = float(data.get('valor', 0))
         
-        if valor <= 0:
+        if not math.isfinite(valor) or valor <= 0:
             return jsonify({'erro': 'Valor deve ser positivo'}), 400
         
-        # Obter conta
-        conta_data = banco.buscar_conta_por_id(user_id)
-        if not conta_data:
-            return jsonify({'erro': 'Conta não encontrada'}), 404
+        # Saque atômico: valida o saldo dentro da mesma transação da escrita
+        novo_saldo, mensagem = obter_banco().sacar(user_id, valor)
+        if novo_saldo is None:
+            codigo = 404 if mensagem == 'Conta não encontrada' else 400
+            return jsonify({'erro': mensagem}), codigo
+        
+        return jsonify({
+            'sucesso': True,
+            'novo_saldo': novo_saldo,
+            'valor_sacado': valor,
+            'mensagem': mensagem
+        })
+        
+    except Exception as e:
+        return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
+
+@app.route('/api/transferencia', methods=['POST'])
+@token_required
+def fazer_transferencia(user_id):
+    """Transferir para outra conta pelo número da conta de destino"""
+    try:
+        data = request.get_json()
+        valor = float(data.get('valor', 0))
+        numero_destino = str(data.get('conta_destino', '')).strip()
         
-        if valor > conta_data['saldo']:
-            return jsonify({'erro': 'Saldo insuficiente'}), 400
+        if not math.isfinite(valor) or valor <= 0:
+            return jsonify({'erro': 'Valor deve ser positivo'}), 400
         
-        # Criar objeto conta e fazer saque
-        conta = ContaBancaria(conta_data, banco)
-        conta.sacar(valor)
+        if valor > 1000000:
+            return jsonify({'erro': 'Valor máximo é R$ 1.000.000'}), 400
         
-        # Obter novo saldo
-        conta.atualizar_saldo_local()
+        destino_id = obter_banco().buscar_id_por_numero_conta(numero_destino) if numero_destino else None
+        if destino_id is None:
+            return jsonify({'erro': 'Conta de destino não encontrada'}), 404
+        
+        # Concorrência otimista: grava só se nenhuma das contas mudou desde a leitura
+        novo_saldo, mensagem = obter_banco().transferir(user_id, destino_id, valor)
+        if novo_saldo is None:
+            if mensagem.startswith('Conta de'):
+                codigo = 404
+            elif mensagem.startswith('Contas em uso'):
+                codigo = 409
+            else:
+                codigo = 400
+            return jsonify({'erro': mensagem}), codigo
         
         return jsonify({
             'sucesso': True,
-            'novo_saldo': conta.saldo,
-            'valor_sacado': valor,
-            'mensagem': f'Saque de R$ {valor:.2f} realizado com sucesso'
+            'novo_saldo': novo_saldo,
+            'valor_transferido': valor,
+            'conta_destino_mascarada': obter_banco().seguranca.mascarar_dados_sensveis(numero_destino, "conta"),
+            'mensagem': mensagem
         })
         
     except Exception as e:
         return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
 
+def normalizar_data_filtro(valor, nome):
+    """Valida uma data de filtro (AAAA-MM-DD ou AAAA-MM-DD HH:MM:SS); retorna (data no formato do banco, erro)"""
+    if not valor:
+        return None, None
+    try:
+        data = datetime.datetime.fromisoformat(valor.strip())
+    except ValueError:
+        return None, f'{nome} inválida: use AAAA-MM-DD ou AAAA-MM-DD HH:MM:SS'
+    # Só a data: o banco trata o dia inteiro; com hora, mesmo formato das datas gravadas
+    if len(valor.strip()) == 10:
+        return data.strftime('%Y-%m-%d'), None
+    return data.strftime('%Y-%m-%d %H:%M:%S'), None
+
 @app.route('/api/historico', methods=['GET'])
 @token_required
 def obter_historico(user_id):
-    """Obter histórico de transações"""
+    """Obter histórico de transações (paginado por cursor)"""
     try:
-        transacoes = banco.obter_historico(user_id)
+        try:
+            limite = int(request.args.get('limite', 50))
+        except ValueError:
+            return jsonify({'erro': 'Limite deve ser um número inteiro'}), 400
+        if limite < 1 or limite > 500:
+            return jsonify({'erro': 'Limite deve estar entre 1 e 500'}), 400
+        
+        datas = {}
+        for parametro in ('data_inicio', 'data_fim'):
+            datas[parametro], erro = normalizar_data_filtro(request.args.get(parametro), parametro)
+            if erro:
+                return jsonify({'erro': erro}), 400
+        
+        try:
+            transacoes, proximo_cursor = obter_banco().obter_pagina_historico(
+                user_id,
+                limite=limite,
+                antes_de=request.args.get('antes_de'),
+                **datas
+            )
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
         
         transacoes_formatadas = []
         for transacao in transacoes:
@@ -365,7 +452,8 @@ def obter_historico(user_id):
         
         return jsonify({
             'transacoes': transacoes_formatadas,
-            'total': len(transacoes_formatadas)
+            'total': len(transacoes_formatadas),
+            'proximo_cursor': proximo_cursor
         })
         
     except Exception as e:
@@ -390,7 +478,7 @@ def admin_required(f):
 def admin_listar_contas():
     """Listar todas as contas (dados mascarados)"""
     try:
-        contas = banco.listar_contas_seguro()
+        contas = obter_banco().listar_contas_seguro()
         
         contas_formatadas = []
         for conta in contas:
@@ -421,6 +509,7 @@ def admin_listar_contas():
 def admin_obter_logs():
     """Obter logs de segurança"""
     try:
+        obter_banco().seguranca.descarregar_logs()
         if os.path.exists('logs_seguranca.txt'):
             with open('logs_seguranca.txt', 'r', encoding='utf-8') as f:
                 logs = f.readlines()
@@ -439,6 +528,20 @@ def admin_obter_logs():
     except Exception as e:
         return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
 
+@app.route('/api/admin/metricas', methods=['GET'])
+@admin_required
+def admin_obter_metricas():
+    """Métricas de contenção das travas por conta e do cache de descriptografia"""
+    try:
+        banco_api = obter_banco()
+        metricas = {'travas': banco_api.travas.estatisticas()}
+        if banco_api.seguranca.cache is not None:
+            metricas['cache_descriptografia'] = banco_api.seguranca.cache.estatisticas()
+        return jsonify(metricas)
+        
+    except Exception as e:
+        return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
+
 @app.route('/api/status', methods=['GET'])
 def status():
     """Status da API"""
@@ -470,4 +573,5 @@ if __name__ == '__main__':
     print("📖 Documentação: http://localhost:5000")
     print("🛡️ Recursos ativos: JWT, Criptografia, Auditoria")
     
+    obter_banco()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Script para arquivar transações antigas em arquivos SQLite mensais.
+
+As transações com mais de N dias saem da tabela viva e vão para
+arquivo_transacoes/transacoes_AAAA_MM.db; o histórico continua lendo esses
+meses de forma transparente quando o período consultado precisa deles.
+
+Uso: python arquivar_transacoes.py [banco.db] [--dias 365] [--diretorio PASTA]
+"""
+
+import argparse
+import os
+import time
+from banco_db import BancoDados
+
+def arquivar_transacoes(nome_db="banco.db", dias=365, diretorio=None):
+    """Executa o arquivamento e imprime o relatório"""
+    if not os.path.exists(nome_db):
+        print(f"❌ Banco de dados '{nome_db}' não encontrado!")
+        return
+
+    banco = BancoDados(nome_db)
+
+    print(f"🗄️  Arquivando transações com mais de {dias} dias de '{nome_db}'...")
+    inicio = time.perf_counter()
+    arquivados = banco.arquivar_transacoes(dias, diretorio)
+    duracao = time.perf_counter() - inicio
+
+    for mes, total in arquivados.items():
+        print(f"   ✅ {mes}: {total} transações arquivadas")
+
+    print("\n📊 === RELATÓRIO ===")
+    print(f"📅 Meses arquivados: {len(arquivados)}")
+    print(f"📦 Transações movidas: {sum(arquivados.values())}")
+    print(f"⏱️  Duração: {duracao:.1f}s")
+
+    banco.fechar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arquiva transações antigas em arquivos mensais")
+    parser.add_argument("banco", nargs="?", default="banco.db", help="banco de dados (padrão: banco.db)")
+    parser.add_argument("--dias", type=int, default=365, help="idade mínima das transações arquivadas (padrão: 365)")
+    parser.add_argument("--diretorio", help="pasta dos arquivos mensais (padrão: arquivo_transacoes ao lado do banco)")
+    argumentos = parser.parse_args()
+    arquivar_transacoes(argumentos.banco, argumentos.dias, argumentos.diretorio)
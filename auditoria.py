@@ -0,0 +1,157 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+class GravadorAuditoria:
+    """Grava a auditoria (linhas no banco e no log de texto) em segundo plano, em lotes"""
+
+    def __init__(self, arquivo_log="logs_seguranca.txt", tamanho_lote=200, intervalo_descarga=0.5,
+                 tamanho_maximo_log=5 * 1024 * 1024, arquivos_backup=3):
+        self.arquivo_log = arquivo_log
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_descarga = intervalo_descarga
+        self.tamanho_maximo_log = tamanho_maximo_log
+        self.arquivos_backup = arquivos_backup
+
+        self._fila = queue.Queue()
+        self._arquivo = None
+        self._trava_inicio = threading.Lock()
+        self._thread = None
+        self._encerrado = False
+
+    def _garantir_iniciado(self):
+        """Inicia a thread de gravação no primeiro uso"""
+        if self._thread is not None:
+            return
+        with self._trava_inicio:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name="gravador-auditoria", daemon=True)
+                self._thread.start()
+                atexit.register(self.encerrar)
+
+    def registrar_linha_log(self, linha):
+        """Enfileira uma linha para o arquivo de log de segurança"""
+        if self._encerrado:
+            return
+        self._garantir_iniciado()
+        self._fila.put(('log', linha))
+
+    def registrar_evento_banco(self, destino, evento):
+        """Enfileira um evento para o banco; destino deve ter gravar_auditoria_lote(eventos)"""
+        if self._encerrado:
+            return
+        self._garantir_iniciado()
+        self._fila.put(('banco', (destino, evento)))
+
+    def descarregar(self, timeout=5.0):
+        """Bloqueia até que tudo o que já foi enfileirado esteja gravado"""
+        if self._thread is None or self._encerrado:
+            return True
+        concluido = threading.Event()
+        self._fila.put(('descarregar', concluido))
+        return concluido.wait(timeout)
+
+    def encerrar(self, timeout=5.0):
+        """Grava o que estiver pendente e para a thread (chamado também no atexit)"""
+        if self._thread is None or self._encerrado:
+            return
+        self._encerrado = True
+        self._fila.put(('encerrar', None))
+        self._thread.join(timeout)
+
+    def _executar(self):
+        """Laço da thread: acumula eventos e grava por lote, por tempo ou sob demanda"""
+        linhas = []
+        eventos_banco = {}
+        prazo = None
+
+        while True:
+            espera = None if prazo is None else max(0.0, prazo - time.monotonic())
+            try:
+                tipo, conteudo = self._fila.get(timeout=espera)
+            except queue.Empty:
+                tipo, conteudo = 'tempo', None
+
+            if tipo == 'log':
+                linhas.append(conteudo)
+            elif tipo == 'banco':
+                destino, evento = conteudo
+                eventos_banco.setdefault(destino, []).append(evento)
+
+            pendentes = len(linhas) + sum(len(eventos) for eventos in eventos_banco.values())
+            if pendentes and prazo is None:
+                prazo = time.monotonic() + self.intervalo_descarga
+
+            if tipo in ('tempo', 'descarregar', 'encerrar') or pendentes >= self.tamanho_lote:
+                self._gravar(linhas, eventos_banco)
+                linhas = []
+                eventos_banco = {}
+                prazo = None
+
+            if tipo == 'descarregar':
+                conteudo.set()
+            elif tipo == 'encerrar':
+                if self._arquivo is not None:
+                    self._arquivo.close()
+                    self._arquivo = None
+                return
+
+    def _gravar(self, linhas, eventos_banco):
+        """Grava um lote: um commit por banco e uma escrita no arquivo de log"""
+        for destino, eventos in eventos_banco.items():
+            try:
+                destino.gravar_auditoria_lote(eventos)
+            except Exception:
+                pass  # Não interrompe o sistema se auditoria falhar
+
+        if linhas:
+            try:
+                self._rotacionar_se_necessario()
+                if self._arquivo is None:
+                    self._arquivo = open(self.arquivo_log, "a", encoding="utf-8")
+                self._arquivo.write("".join(linhas))
+                self._arquivo.flush()
+            except Exception:
+                pass  # Não interrompe o sistema se log falhar
+
+    def _rotacionar_se_necessario(self):
+        """Rotaciona o log por tamanho: arquivo.txt -> arquivo.txt.1 -> ... -> .N"""
+        try:
+            tamanho = os.path.getsize(self.arquivo_log)
+        except OSError:
+            tamanho = 0
+            # Arquivo removido externamente: reabrir na próxima escrita
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+
+        if tamanho < self.tamanho_maximo_log:
+            return
+
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+        for indice in range(self.arquivos_backup - 1, 0, -1):
+            origem = f"{self.arquivo_log}.{indice}"
+            if os.path.exists(origem):
+                os.replace(origem, f"{self.arquivo_log}.{indice + 1}")
+        if self.arquivos_backup > 0:
+            os.replace(self.arquivo_log, f"{self.arquivo_log}.1")
+        else:
+            os.remove(self.arquivo_log)
+
+_gravadores = {}
+_trava_gravadores = threading.Lock()
+
+def obter_gravador(arquivo_log="logs_seguranca.txt"):
+    """Retorna o gravador de auditoria compartilhado no processo para o arquivo de log"""
+    caminho = os.path.abspath(arquivo_log)
+    with _trava_gravadores:
+        gravador = _gravadores.get(caminho)
+        if gravador is None:
+            gravador = GravadorAuditoria(caminho)
+            _gravadores[caminho] = gravador
+        return gravador
@@ -1,110 +1,304 @@
 import sqlite3
-from datetime import datetime
+import base64
+import csv
+import hashlib
+import json
+import math
+from datetime import datetime, timedelta, timezone
 import os
-from seguranca import Seguranca
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from seguranca import Seguranca, converter_para_binario
+from auditoria import obter_gravador
+from pool_conexoes import PoolConexoes, repetir_se_ocupado, uri_memoria, uri_somente_leitura
+from migracoes import aplicar_migracoes
+from commit_em_grupo import CommitEmGrupo
+from travas import GerenciadorTravas
+
+# Efeito de cada tipo de transação sobre o saldo
+SINAL_TIPO_TRANSACAO = {
+    "DEPOSITO": 1,
+    "SAQUE": -1,
+    "TRANSFERENCIA_ENVIADA": -1,
+    "TRANSFERENCIA_RECEBIDA": 1,
+}
+
+# Onde os dados ficam: arquivo SQLite em disco ou banco em memória (testes e benchmarks)
+BACKENDS = ("arquivo", "memoria")
+BACKEND_PADRAO = "arquivo"
+
+# Concorrência otimista das transferências: releituras após conflito de versão
+TENTATIVAS_TRANSFERENCIA = 8
+ESPERA_INICIAL_CONFLITO = 0.001
+
+# Quantas linhas rejeitadas a importação detalha no resumo (as demais só entram na contagem)
+LIMITE_ERROS_IMPORTACAO = 100
+
+# Colunas criptografadas recifradas na rotação de chave, por tabela
+COLUNAS_CRIPTOGRAFADAS = {
+    'contas': ['titular_criptografado', 'saldo_criptografado'],
+    'transacoes': ['valor_criptografado', 'descricao_criptografada'],
+    'saldos_checkpoint': ['saldo_criptografado'],
+}
+
+class _ConflitoVersao(Exception):
+    """A versão da conta mudou entre a leitura e a gravação (compare-and-swap falhou)"""
+
+_NAO_DESCRIPTOGRAFADO = object()
+
+class RegistroConta:
+    """Conta lida do banco: titular e saldo só são descriptografados no primeiro acesso
+    
+    Aceita também o acesso de dicionário usado pelo código existente (conta['saldo']).
+    Saldo que não descriptografa vira None (antes, a busca inteira retornava None).
+    """
+    
+    __slots__ = ('id', 'numero_conta', 'bloqueada', '_seguranca',
+                 '_titular_criptografado', '_saldo_criptografado', '_titular', '_saldo')
+    
+    CAMPOS = ('id', 'numero_conta', 'titular', 'saldo', 'bloqueada')
+    
+    def __init__(self, seguranca, id_conta, numero_conta, titular_criptografado, saldo_criptografado, bloqueada):
+        self.id = id_conta
+        self.numero_conta = numero_conta
+        self.bloqueada = bool(bloqueada)
+        self._seguranca = seguranca
+        self._titular_criptografado = titular_criptografado
+        self._saldo_criptografado = saldo_criptografado
+        self._titular = _NAO_DESCRIPTOGRAFADO
+        self._saldo = _NAO_DESCRIPTOGRAFADO
+    
+    @property
+    def titular(self):
+        if self._titular is _NAO_DESCRIPTOGRAFADO:
+            self._titular = self._seguranca.descriptografar_dados(self._titular_criptografado)
+        return self._titular
+    
+    @property
+    def saldo(self):
+        if self._saldo is _NAO_DESCRIPTOGRAFADO:
+            saldo_str = self._seguranca.descriptografar_dados(self._saldo_criptografado)
+            try:
+                self._saldo = float(saldo_str) if saldo_str else 0.0
+            except (TypeError, ValueError):
+                # Ilegível (ex.: chave fora do chaveiro): None, como a busca antiga retornava no lugar da conta
+                self._saldo = None
+        return self._saldo
+    
+    def __getitem__(self, campo):
+        if campo not in self.CAMPOS:
+            raise KeyError(campo)
+        return getattr(self, campo)
+    
+    def __contains__(self, campo):
+        return campo in self.CAMPOS
+    
+    def get(self, campo, padrao=None):
+        return getattr(self, campo) if campo in self.CAMPOS else padrao
+    
+    def keys(self):
+        return self.CAMPOS
+    
+    def como_dicionario(self):
+        """Todos os campos descriptografados, como o dicionário retornado antes"""
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+    
+    def __repr__(self):
+        return f"RegistroConta(id={self.id}, numero_conta={self.numero_conta!r})"
 
 class BancoDados:
-    def __init__(self, nome_db="banco.db"):
+    def __init__(self, nome_db="banco.db", tamanho_pool=5, perfil=None, intervalo_checkpoint=50,
+                 commit_em_grupo=False, tamanho_lote_commit=64, espera_commit=0.005, faixas_travas=64,
+                 backend=None, snapshot=None, tamanho_pool_leitura=None, cache_descriptografia=None,
+                 cifra=None, iteracoes_senha=None, processos_hash=None):
         self.nome_db = nome_db
-        self.seguranca = Seguranca()
+        self.intervalo_checkpoint = intervalo_checkpoint
+        self.seguranca = Seguranca(cache_descriptografia=cache_descriptografia, cifra=cifra,
+                                   iteracoes_senha=iteracoes_senha, processos_hash=processos_hash)
+        
+        # Backend: "arquivo" (nome_db no disco) ou "memoria" (banco isolado em memória, opcionalmente
+        # carregado de um snapshot em disco); padrão pela variável de ambiente BANCO_BACKEND
+        self.backend = backend or os.environ.get("BANCO_BACKEND", BACKEND_PADRAO)
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Backend desconhecido: {self.backend} (opções: {', '.join(BACKENDS)})")
+        self._conexao_memoria = None
+        if self.backend == "memoria":
+            endereco = uri_memoria(nome_db)
+            # Conexão mantida aberta: o banco em memória existe enquanto houver uma conexão
+            self._conexao_memoria = sqlite3.connect(endereco, uri=True, check_same_thread=False)
+            if snapshot:
+                self.carregar_snapshot(snapshot)
+            self.pool = PoolConexoes(endereco, tamanho=tamanho_pool, perfil=perfil, uri=True)
+        else:
+            self.pool = PoolConexoes(nome_db, tamanho=tamanho_pool, perfil=perfil)
+        self.travas = GerenciadorTravas(faixas_travas)  # Serializa, no processo, operações na mesma conta
         self.criar_tabelas()
+        
+        # Pool separado, somente leitura, para consultas e relatórios: sob WAL, leituras longas
+        # não ocupam as conexões de escrita nem bloqueiam depósitos e saques
+        self.pool_leitura = PoolConexoes(
+            self.pool.nome_db if self.backend == "memoria" else uri_somente_leitura(nome_db),
+            tamanho=tamanho_pool_leitura or tamanho_pool, perfil=perfil, uri=True, somente_leitura=True
+        )
+        
+        # Commit em grupo (opcional): escritas de várias threads confirmadas em um único commit
+        self.commit_em_grupo = None
+        if commit_em_grupo:
+            self.commit_em_grupo = CommitEmGrupo(self.conectar, tamanho_lote_commit, espera_commit)
     
     def conectar(self):
-        """Conecta ao banco de dados SQLite"""
-        return sqlite3.connect(self.nome_db)
+        """Empresta uma conexão do pool (conn.close() a devolve)"""
+        return self.pool.obter()
+    
+    def conectar_leitura(self):
+        """Empresta uma conexão somente leitura (mode=ro e query_only), para métodos que só consultam"""
+        return self.pool_leitura.obter()
+    
+    def fechar(self):
+        """Encerra o commit em grupo (se ativo) e o pool de conexões (no backend em memória, descarta o banco)"""
+        if self.commit_em_grupo is not None:
+            self.commit_em_grupo.encerrar()
+        self.pool.fechar()
+        self.pool_leitura.fechar()
+        if self._conexao_memoria is not None:
+            self._conexao_memoria.close()
+            self._conexao_memoria = None
+    
+    def carregar_snapshot(self, caminho_arquivo):
+        """Copia um banco em disco para o banco em memória (substitui o conteúdo atual)"""
+        if self._conexao_memoria is None:
+            raise ValueError("Snapshot só pode ser carregado no backend em memória")
+        origem = sqlite3.connect(caminho_arquivo)
+        try:
+            origem.backup(self._conexao_memoria)
+        finally:
+            origem.close()
+    
+    def salvar_snapshot(self, caminho_arquivo):
+        """Grava uma cópia consistente do banco (em memória ou em disco) em caminho_arquivo"""
+        destino = sqlite3.connect(caminho_arquivo)
+        conn = self.conectar_leitura()
+        try:
+            conn.backup(destino)
+        finally:
+            conn.close()
+            destino.close()
     
     def criar_tabelas(self):
-        """Cria as tabelas necessárias se não existirem"""
+        """Aplica as migrações de esquema pendentes (nada a fazer em banco já atualizado)"""
         conn = self.conectar()
-        cursor = conn.cursor()
+        try:
+            aplicar_migracoes(self, conn)
+        finally:
+            conn.close()
+    
+    def migrar_indice_cego(self, cursor):
+        """Adiciona e preenche a coluna de índice cego do titular"""
+        cursor.execute("PRAGMA table_info(contas)")
+        colunas = [coluna[1] for coluna in cursor.fetchall()]
+        if 'titular_indice' not in colunas:
+            cursor.execute("ALTER TABLE contas ADD COLUMN titular_indice TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_contas_titular_indice ON contas (titular_indice)")
         
-        # Tabela de contas com segurança
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS contas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero_conta TEXT UNIQUE NOT NULL,
-                titular_criptografado TEXT NOT NULL,
-                hash_senha TEXT NOT NULL,
-                salt_senha TEXT NOT NULL,
-                saldo_criptografado TEXT NOT NULL,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                tentativas_login INTEGER DEFAULT 0,
-                bloqueada BOOLEAN DEFAULT 0
-            )
-        ''')
-        
-        # Tabela de transações
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transacoes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conta_id INTEGER,
-                tipo TEXT NOT NULL,
-                valor_criptografado TEXT NOT NULL,
-                data_transacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                descricao_criptografada TEXT,
-                FOREIGN KEY (conta_id) REFERENCES contas (id)
-            )
-        ''')
-        
-        # Tabela de auditoria de acessos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS auditoria (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero_conta TEXT,
-                acao TEXT NOT NULL,
-                sucesso BOOLEAN NOT NULL,
-                ip_tentativa TEXT,
-                data_tentativa TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # Preencher contas antigas (sem índice) descriptografando uma única vez
+        cursor.execute("SELECT id, titular_criptografado FROM contas WHERE titular_indice IS NULL")
+        pendentes = cursor.fetchall()
+        if pendentes:
+            chave = self.seguranca.obter_chave_criptografia()
+            atualizacoes = []
+            for id_conta, titular_criptografado in pendentes:
+                titular = self.seguranca.descriptografar_dados(titular_criptografado)
+                atualizacoes.append((self.seguranca.calcular_indice_cego(titular, chave), id_conta))
+            cursor.executemany("UPDATE contas SET titular_indice = ? WHERE id = ?", atualizacoes)
+    
+    @repetir_se_ocupado
+    def migrar_formato_binario(self, tamanho_lote=500):
+        """Converte, em lotes, os valores criptografados TEXT legados para BLOB"""
+        colunas_por_tabela = {
+            'contas': ['titular_criptografado', 'saldo_criptografado'],
+            'transacoes': ['valor_criptografado', 'descricao_criptografada'],
+        }
+        convertidos = {}
         
-        conn.commit()
-        conn.close()
+        conn = self.conectar()
+        cursor = conn.cursor()
+        try:
+            for tabela, colunas in colunas_por_tabela.items():
+                convertidos[tabela] = 0
+                ultimo_id = 0
+                atribuicoes = ", ".join(f"{coluna} = ?" for coluna in colunas)
+                
+                while True:
+                    cursor.execute(
+                        f"SELECT id, {', '.join(colunas)} FROM {tabela} WHERE id > ? ORDER BY id LIMIT ?",
+                        (ultimo_id, tamanho_lote)
+                    )
+                    linhas = cursor.fetchall()
+                    if not linhas:
+                        break
+                    
+                    atualizacoes = []
+                    for linha in linhas:
+                        valores = [converter_para_binario(valor) for valor in linha[1:]]
+                        if any(valor is not None for valor in valores):
+                            # Mantém como está o que não for TEXT legado válido
+                            novos = [novo if novo is not None else antigo for novo, antigo in zip(valores, linha[1:])]
+                            atualizacoes.append((*novos, linha[0]))
+                    
+                    if atualizacoes:
+                        cursor.executemany(f"UPDATE {tabela} SET {atribuicoes} WHERE id = ?", atualizacoes)
+                        conn.commit()
+                        convertidos[tabela] += len(atualizacoes)
+                    ultimo_id = linhas[-1][0]
+            
+            return convertidos
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _condicao_indice_cego(self, titular):
+        """Monta o filtro SQL que localiza o titular pelo índice cego"""
+        indices = self.seguranca.calcular_indices_cegos(titular)
+        marcadores = ", ".join("?" for _ in indices)
+        return f"titular_indice IN ({marcadores})", indices
     
     def criar_conta(self, titular, senha, saldo_inicial=0.0):
         """Cria uma nova conta bancária com autenticação"""
-        conn = self.conectar()
-        cursor = conn.cursor()
-        
         try:
             # Validar entrada
             valido, titular_limpo = self.seguranca.validar_entrada_segura(titular, "nome")
             if not valido:
                 return None, titular_limpo  # Retorna erro
             
-            # Verificar se conta já existe - buscar todas e descriptografar
-            cursor.execute("SELECT titular_criptografado FROM contas")
-            contas_existentes = cursor.fetchall()
-            
-            for conta_cripto in contas_existentes:
-                titular_existente = self.seguranca.descriptografar_dados(conta_cripto[0])
-                if titular_existente and titular_existente.lower().strip() == titular_limpo.lower().strip():
+            # Verificar se conta já existe - consulta pelo índice cego (só evita o hash de duplicatas óbvias)
+            condicao, parametros = self._condicao_indice_cego(titular_limpo)
+            conn = self.conectar_leitura()
+            try:
+                if conn.execute(f"SELECT 1 FROM contas WHERE {condicao} LIMIT 1", parametros).fetchone():
                     return None, "Conta já existe para este titular"
+            finally:
+                conn.close()
             
-            # Gerar dados seguros
+            # Gerar dados seguros - o hash (lento) roda sem conexão emprestada do pool
             numero_conta = self.seguranca.gerar_numero_conta_seguro()
             hash_senha, salt_senha = self.seguranca.hash_senha(senha)
             titular_criptografado = self.seguranca.criptografar_dados(titular_limpo)
+            titular_indice = self.seguranca.calcular_indice_cego(titular_limpo)
             saldo_criptografado = self.seguranca.criptografar_dados(str(saldo_inicial))
             
-            # Inserir conta
-            cursor.execute("""
-                INSERT INTO contas (numero_conta, titular_criptografado, hash_senha, salt_senha, saldo_criptografado) 
-                VALUES (?, ?, ?, ?, ?)
-            """, (numero_conta, titular_criptografado, hash_senha, salt_senha, saldo_criptografado))
-            
-            conta_id = cursor.lastrowid
-            
-            # Registrar transação inicial se houver saldo
-            if saldo_inicial > 0:
-                valor_criptografado = self.seguranca.criptografar_dados(str(saldo_inicial))
-                descricao_criptografada = self.seguranca.criptografar_dados("Saldo inicial")
-                cursor.execute("""
-                    INSERT INTO transacoes (conta_id, tipo, valor_criptografado, descricao_criptografada) 
-                    VALUES (?, ?, ?, ?)
-                """, (conta_id, "DEPOSITO", valor_criptografado, descricao_criptografada))
-            
-            conn.commit()
+            # Nova verificação e INSERT na mesma transação de escrita (BEGIN IMMEDIATE): nenhum
+            # criar_conta concorrente grava o mesmo titular entre as duas
+            conta_id = self._executar_escrita(lambda cursor: self._inserir_conta(
+                cursor, condicao, parametros, numero_conta, titular_criptografado, titular_indice,
+                hash_senha, salt_senha, saldo_criptografado, saldo_inicial
+            ))
+            if conta_id is None:
+                return None, "Conta já existe para este titular"
             
             # Log de auditoria
             self.registrar_auditoria(numero_conta, "CRIACAO_CONTA", True)
@@ -113,17 +307,206 @@ class BancoDados:
             return conta_id, numero_conta
             
         except Exception as e:
-            conn.rollback()
             self.seguranca.log_acesso(titular if 'titular' in locals() else "DESCONHECIDO", "ERRO_CRIACAO", False)
             return None, f"Erro ao criar conta: {str(e)}"
+    
+    def _inserir_conta(self, cursor, condicao, parametros, numero_conta, titular_criptografado, titular_indice,
+                       hash_senha, salt_senha, saldo_criptografado, saldo_inicial):
+        """Insere a conta se o titular ainda não existir; retorna o id (ou None se já existe)"""
+        cursor.execute(f"SELECT 1 FROM contas WHERE {condicao} LIMIT 1", parametros)
+        if cursor.fetchone():
+            return None
+        
+        # Inserir conta
+        cursor.execute("""
+            INSERT INTO contas (numero_conta, titular_criptografado, titular_indice, hash_senha, salt_senha, saldo_criptografado) 
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (numero_conta, titular_criptografado, titular_indice, hash_senha, salt_senha, saldo_criptografado))
+        conta_id = cursor.lastrowid
+        
+        # Registrar transação inicial se houver saldo
+        if saldo_inicial > 0:
+            self._inserir_transacao(cursor, conta_id, "DEPOSITO", saldo_inicial, "Saldo inicial")
+        return conta_id
+    
+    def criar_contas_em_lote(self, contas, tamanho_lote=500, max_workers=None):
+        """Cria várias contas de uma vez; retorna [(conta_id, numero_conta ou mensagem de erro)] na ordem de entrada
+        
+        Cada item pode ser (titular, senha), (titular, senha, saldo_inicial) ou um dicionário
+        com essas chaves. Criptografia roda em um pool de threads (o hash de senha segue para o
+        pool de processos de Seguranca) e cada lote é gravado com executemany em uma única transação.
+        
+        A vazão é limitada pelo custo do hash: cerca de 60 * processos_hash / segundos_por_hash contas
+        por minuto. Cargas em massa podem usar BancoDados(iteracoes_senha=...) menor; esses hashes
+        são refeitos com o custo configurado no primeiro login de cada conta.
+        """
+        resultados = []
+        vistos = set()  # índices cegos já aceitos neste processamento
+        lote = []
+        
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+            for item in contas:
+                lote.append(item)
+                if len(lote) >= tamanho_lote:
+                    resultados.extend(self._criar_lote_contas(lote, vistos, executor))
+                    lote = []
+            if lote:
+                resultados.extend(self._criar_lote_contas(lote, vistos, executor))
+        
+        return resultados
+    
+    def _preparar_conta(self, titular, senha, saldo_inicial):
+        """Hash da senha e criptografia dos campos de uma conta (executado no pool)"""
+        hash_senha, salt_senha = self.seguranca.hash_senha(senha)
+        preparada = {
+            'titular_criptografado': self.seguranca.criptografar_dados(titular),
+            'titular_indice': self.seguranca.calcular_indice_cego(titular),
+            'hash_senha': hash_senha,
+            'salt_senha': salt_senha,
+            'saldo_criptografado': self.seguranca.criptografar_dados(str(saldo_inicial)),
+        }
+        if saldo_inicial > 0:
+            preparada['valor_criptografado'] = self.seguranca.criptografar_dados(str(saldo_inicial))
+            preparada['descricao_criptografada'] = self.seguranca.criptografar_dados("Saldo inicial")
+        return preparada
+    
+    def _selecionar_existentes(self, cursor, coluna, valores):
+        """Retorna quais valores já existem na coluna de contas (consultas em blocos de 500)"""
+        valores = list(valores)
+        existentes = set()
+        for i in range(0, len(valores), 500):
+            bloco = valores[i:i + 500]
+            marcadores = ", ".join("?" for _ in bloco)
+            cursor.execute(f"SELECT {coluna} FROM contas WHERE {coluna} IN ({marcadores})", bloco)
+            existentes.update(linha[0] for linha in cursor.fetchall())
+        return existentes
+    
+    def _criar_lote_contas(self, itens, vistos, executor):
+        """Valida, prepara em paralelo e grava um lote de contas em uma transação"""
+        resultados = [None] * len(itens)
+        validas = []  # (posição, titular, senha, saldo_inicial, índices cegos)
+        
+        for posicao, item in enumerate(itens):
+            if isinstance(item, dict):
+                titular, senha, saldo_inicial = item.get('titular'), item.get('senha'), item.get('saldo_inicial', 0.0)
+            else:
+                titular, senha, saldo_inicial = (tuple(item) + (0.0,))[:3]
+            
+            valido, titular_limpo = self.seguranca.validar_entrada_segura(titular or "", "nome")
+            if not valido:
+                resultados[posicao] = (None, titular_limpo)
+                continue
+            if not senha:
+                resultados[posicao] = (None, "Senha não pode estar vazia")
+                continue
+            try:
+                saldo_inicial = float(saldo_inicial or 0.0)
+            except (TypeError, ValueError):
+                resultados[posicao] = (None, "Saldo inicial deve ser numérico")
+                continue
+            if saldo_inicial < 0:
+                resultados[posicao] = (None, "Saldo inicial não pode ser negativo")
+                continue
+            
+            validas.append((posicao, titular_limpo, senha, saldo_inicial,
+                            self.seguranca.calcular_indices_cegos(titular_limpo)))
+        
+        if not validas:
+            return resultados
+        
+        conn = self.conectar()
+        cursor = conn.cursor()
+        
+        try:
+            # Duplicidade: contra o banco (índice cego) e dentro do próprio processamento. Esta leitura
+            # só evita o hash de duplicatas óbvias; a verificação que vale é refeita sob a trava de escrita
+            existentes = self._selecionar_existentes(cursor, 'titular_indice',
+                                                     {indice for *_, indices in validas for indice in indices})
+            candidatas = []
+            for posicao, titular, senha, saldo_inicial, indices in validas:
+                if existentes.intersection(indices) or vistos.intersection(indices):
+                    resultados[posicao] = (None, "Conta já existe para este titular")
+                    continue
+                vistos.update(indices)
+                candidatas.append((posicao, titular, senha, saldo_inicial, indices))
+            
+            if not candidatas:
+                return resultados
+            
+            # Hash e criptografia em paralelo (fora da trava de escrita)
+            preparadas = list(executor.map(lambda conta: self._preparar_conta(*conta[1:4]), candidatas))
+            
+            # Trava de escrita antes das verificações: nenhum criar_conta concorrente entra entre elas e o INSERT
+            cursor.execute("BEGIN IMMEDIATE")
+            existentes = self._selecionar_existentes(cursor, 'titular_indice',
+                                                     {indice for *_, indices in candidatas for indice in indices})
+            aceitas = []
+            for conta, preparada in zip(candidatas, preparadas):
+                if existentes.intersection(conta[4]):
+                    resultados[conta[0]] = (None, "Conta já existe para este titular")
+                    continue
+                aceitas.append((conta[0], conta[1], preparada))
+            
+            if not aceitas:
+                conn.rollback()
+                return resultados
+            preparadas = [preparada for *_, preparada in aceitas]
+            
+            # Números de conta únicos no lote e no banco
+            numeros = set()
+            while len(numeros) < len(aceitas):
+                faltam = len(aceitas) - len(numeros)
+                candidatos = {self.seguranca.gerar_numero_conta_seguro() for _ in range(faltam)} - numeros
+                numeros.update(candidatos - self._selecionar_existentes(cursor, 'numero_conta', candidatos))
+            numeros = list(numeros)
+            
+            cursor.executemany("""
+                INSERT INTO contas (numero_conta, titular_criptografado, titular_indice, hash_senha, salt_senha, saldo_criptografado)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (numero, p['titular_criptografado'], p['titular_indice'], p['hash_senha'], p['salt_senha'], p['saldo_criptografado'])
+                for numero, p in zip(numeros, preparadas)
+            ])
+            
+            marcadores = ", ".join("?" for _ in numeros)
+            cursor.execute(f"SELECT numero_conta, id FROM contas WHERE numero_conta IN ({marcadores})", numeros)
+            ids = dict(cursor.fetchall())
+            
+            # Transação de saldo inicial das contas que têm saldo
+            cursor.executemany("""
+                INSERT INTO transacoes (conta_id, tipo, valor_criptografado, descricao_criptografada)
+                VALUES (?, ?, ?, ?)
+            """, [
+                (ids[numero], "DEPOSITO", p['valor_criptografado'], p['descricao_criptografada'])
+                for numero, p in zip(numeros, preparadas) if 'valor_criptografado' in p
+            ])
+            if self.intervalo_checkpoint <= 1:
+                for numero, p in zip(numeros, preparadas):
+                    if 'valor_criptografado' in p:
+                        self._gravar_checkpoint(cursor, ids[numero])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            for posicao, *_ in validas:
+                if resultados[posicao] is None:
+                    resultados[posicao] = (None, f"Erro ao criar conta: {str(e)}")
+            return resultados
         finally:
             conn.close()
+        
+        for (posicao, titular, _), numero in zip(aceitas, numeros):
+            resultados[posicao] = (ids[numero], numero)
+            self.registrar_auditoria(numero, "CRIACAO_CONTA", True)
+            self.seguranca.log_acesso(titular, "CONTA_CRIADA", True)
+        
+        return resultados
     
     def autenticar_usuario(self, titular, senha):
-        """Autentica usuário com senha"""
-        conn = self.conectar()
-        cursor = conn.cursor()
+        """Autentica usuário com senha
         
+        A conta é lida por uma conexão de leitura devolvida antes de verificar a senha: o
+        PBKDF2 (e o eventual rehash) não prende conexões do pool enquanto calcula.
+        """
         try:
             # Validar entrada
             valido, titular_limpo = self.seguranca.validar_entrada_segura(titular, "nome")
@@ -131,23 +514,16 @@ class BancoDados:
                 self.seguranca.log_acesso(titular, "LOGIN_INVALIDO", False)
                 return None, titular_limpo
             
-            # Buscar todas as contas e descriptografar para comparação
-            cursor.execute("""
-                SELECT id, numero_conta, titular_criptografado, hash_senha, salt_senha, saldo_criptografado, tentativas_login, bloqueada 
-                FROM contas
-            """)
-            
-            todas_contas = cursor.fetchall()
-            conta_encontrada = None
-            
-            # Procurar conta descriptografando os titulares
-            for conta_data in todas_contas:
-                id_conta, numero_conta, titular_criptografado, hash_senha, salt_senha, saldo_criptografado, tentativas, bloqueada = conta_data
-                titular_descriptografado = self.seguranca.descriptografar_dados(titular_criptografado)
-                
-                if titular_descriptografado and titular_descriptografado.lower().strip() == titular_limpo.lower().strip():
-                    conta_encontrada = conta_data
-                    break
+            # Buscar a conta pelo índice cego (consulta indexada, sem descriptografar)
+            condicao, parametros = self._condicao_indice_cego(titular_limpo)
+            conn = self.conectar_leitura()
+            try:
+                conta_encontrada = conn.execute(f"""
+                    SELECT id, numero_conta, titular_criptografado, hash_senha, salt_senha, saldo_criptografado, tentativas_login, bloqueada 
+                    FROM contas WHERE {condicao} LIMIT 1
+                """, parametros).fetchone()
+            finally:
+                conn.close()
             
             if not conta_encontrada:
                 self.seguranca.log_acesso(titular_limpo, "LOGIN_CONTA_INEXISTENTE", False)
@@ -163,9 +539,17 @@ class BancoDados:
             
             # Verificar senha
             if self.seguranca.verificar_senha(senha, hash_armazenado, salt_armazenado):
-                # Login bem-sucedido - resetar tentativas
-                cursor.execute("UPDATE contas SET tentativas_login = 0 WHERE id = ?", (id_conta,))
-                conn.commit()
+                # Login bem-sucedido - resetar tentativas e, se o hash for legado ou mais
+                # barato que o configurado, refazê-lo agora que a senha é conhecida
+                if self.seguranca.precisa_rehash(hash_armazenado):
+                    novo_hash, novo_salt = self.seguranca.hash_senha(senha)
+                    self._executar_escrita(lambda cursor: cursor.execute("""
+                        UPDATE contas SET tentativas_login = 0, hash_senha = ?, salt_senha = ? WHERE id = ?
+                    """, (novo_hash, novo_salt, id_conta)))
+                else:
+                    self._executar_escrita(lambda cursor: cursor.execute(
+                        "UPDATE contas SET tentativas_login = 0 WHERE id = ?", (id_conta,)
+                    ))
                 
                 # Descriptografar saldo
                 saldo_descriptografado = self.seguranca.descriptografar_dados(saldo_criptografado)
@@ -182,15 +566,10 @@ class BancoDados:
                     'saldo': saldo
                 }, "Login realizado com sucesso"
             else:
-                # Senha incorreta - incrementar tentativas
-                tentativas += 1
+                # Senha incorreta - incrementar tentativas (no banco: a leitura acima pode estar defasada)
+                tentativas = self._executar_escrita(lambda cursor: self._registrar_senha_incorreta(cursor, id_conta))
                 bloqueada_agora = tentativas >= 5
                 
-                cursor.execute("""
-                    UPDATE contas SET tentativas_login = ?, bloqueada = ? WHERE id = ?
-                """, (tentativas, bloqueada_agora, id_conta))
-                conn.commit()
-                
                 # Log de falha
                 self.registrar_auditoria(numero_conta, "LOGIN_SENHA_INCORRETA", False)
                 self.seguranca.log_acesso(titular_limpo, "LOGIN_SENHA_INCORRETA", False)
@@ -203,95 +582,1012 @@ class BancoDados:
         except Exception as e:
             self.seguranca.log_acesso(titular if 'titular' in locals() else "DESCONHECIDO", "ERRO_LOGIN", False)
             return None, f"Erro na autenticação: {str(e)}"
-        finally:
-            conn.close()
+    
+    def _registrar_senha_incorreta(self, cursor, conta_id):
+        """Incrementa as tentativas de login (bloqueando na quinta) e retorna o novo total"""
+        cursor.execute("""
+            UPDATE contas SET tentativas_login = tentativas_login + 1, bloqueada = (tentativas_login + 1 >= 5) WHERE id = ?
+        """, (conta_id,))
+        cursor.execute("SELECT tentativas_login FROM contas WHERE id = ?", (conta_id,))
+        return cursor.fetchone()[0]
     
     def registrar_auditoria(self, numero_conta, acao, sucesso):
-        """Registra evento de auditoria"""
+        """Registra evento de auditoria (gravação assíncrona em lote)"""
+        data_tentativa = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        obter_gravador(self.seguranca.arquivo_log).registrar_evento_banco(
+            self, (numero_conta, acao, sucesso, data_tentativa)
+        )
+    
+    @repetir_se_ocupado
+    def gravar_auditoria_lote(self, eventos):
+        """Grava um lote de eventos de auditoria em uma única transação"""
         conn = self.conectar()
         cursor = conn.cursor()
         
         try:
-            cursor.execute("""
-                INSERT INTO auditoria (numero_conta, acao, sucesso) 
-                VALUES (?, ?, ?)
-            """, (numero_conta, acao, sucesso))
+            cursor.executemany("""
+                INSERT INTO auditoria (numero_conta, acao, sucesso, data_tentativa) 
+                VALUES (?, ?, ?, ?)
+            """, eventos)
             conn.commit()
         except Exception:
-            pass  # Não interrompe o sistema se auditoria falhar
+            conn.rollback()
+            raise
         finally:
             conn.close()
     
     
+    @repetir_se_ocupado
     def atualizar_saldo(self, conta_id, novo_saldo):
         """Atualiza o saldo de uma conta de forma segura"""
+        with self.travas.travar(conta_id):
+            conn = self.conectar()
+            cursor = conn.cursor()
+            
+            try:
+                saldo_criptografado = self.seguranca.criptografar_dados(str(novo_saldo))
+                cursor.execute("UPDATE contas SET saldo_criptografado = ?, versao = versao + 1 WHERE id = ?", (saldo_criptografado, conta_id))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                conn.close()
+    
+    def depositar(self, conta_id, valor, descricao=None):
+        """Deposita em uma única transação; retorna (novo_saldo, mensagem)"""
+        if descricao is None:
+            descricao = f"Depósito de R$ {valor:.2f}"
+        return self._movimentar_saldo(conta_id, "DEPOSITO", valor, descricao)
+    
+    def sacar(self, conta_id, valor, descricao=None):
+        """Saca em uma única transação; retorna (novo_saldo, mensagem)"""
+        if descricao is None:
+            descricao = f"Saque de R$ {valor:.2f}"
+        return self._movimentar_saldo(conta_id, "SAQUE", valor, descricao)
+    
+    def _movimentar_saldo(self, conta_id, tipo, valor, descricao):
+        """Lê, valida, atualiza o saldo e registra a transação em uma única transação"""
+        if not math.isfinite(valor) or valor <= 0:
+            return None, "Valor deve ser positivo"
+        with self.travas.travar(conta_id):
+            return self._executar_escrita(
+                lambda cursor: self._movimentar_saldo_cursor(cursor, conta_id, tipo, valor, descricao)
+            )
+    
+    def _movimentar_saldo_cursor(self, cursor, conta_id, tipo, valor, descricao):
+        """Corpo da movimentação, executado dentro de uma transação de escrita já aberta"""
+        cursor.execute("SELECT saldo_criptografado FROM contas WHERE id = ?", (conta_id,))
+        resultado = cursor.fetchone()
+        if not resultado:
+            return None, "Conta não encontrada"
+        
+        saldo_str = self.seguranca.descriptografar_dados(resultado[0])
+        saldo = float(saldo_str) if saldo_str else 0.0
+        
+        if tipo == "SAQUE":
+            if valor > saldo:
+                return None, "Saldo insuficiente"
+            novo_saldo = saldo - valor
+        else:
+            novo_saldo = saldo + valor
+        
+        cursor.execute("UPDATE contas SET saldo_criptografado = ?, versao = versao + 1 WHERE id = ?",
+                       (self.seguranca.criptografar_dados(str(novo_saldo)), conta_id))
+        self._inserir_transacao(cursor, conta_id, tipo, valor, descricao)
+        
+        operacao = "Depósito" if tipo == "DEPOSITO" else "Saque"
+        return novo_saldo, f"{operacao} de R$ {valor:.2f} realizado com sucesso"
+    
+    def buscar_id_por_numero_conta(self, numero_conta):
+        """Retorna o id da conta com o número informado (ou None)"""
+        conn = self.conectar_leitura()
+        
+        try:
+            linha = conn.execute("SELECT id FROM contas WHERE numero_conta = ?", (numero_conta,)).fetchone()
+            return linha[0] if linha else None
+        finally:
+            conn.close()
+    
+    def transferir(self, origem, destino, valor, descricao=None):
+        """Transfere entre contas com concorrência otimista; retorna (novo_saldo_origem, mensagem)
+        
+        Saldos e versões são lidos e recalculados (com a criptografia) fora da trava de escrita;
+        a gravação só acontece se nenhuma das duas contas mudou de versão nesse meio tempo
+        (compare-and-swap). Em conflito, a operação é refeita até TENTATIVAS_TRANSFERENCIA vezes.
+        """
+        if not math.isfinite(valor) or valor <= 0:
+            return None, "Valor deve ser positivo"
+        if origem == destino:
+            return None, "Conta de destino deve ser diferente da conta de origem"
+        
+        espera = ESPERA_INICIAL_CONFLITO
+        for tentativa in range(TENTATIVAS_TRANSFERENCIA):
+            try:
+                # Trava das duas contas no processo; entre processos vale o compare-and-swap
+                with self.travas.travar(origem, destino):
+                    return self._tentar_transferencia(origem, destino, valor, descricao)
+            except _ConflitoVersao:
+                # Outra operação alterou uma das contas: reler e tentar de novo
+                time.sleep(espera * (1 + random.random()))
+                espera *= 2
+        
+        return None, "Contas em uso por outras operações, tente novamente"
+    
+    def _tentar_transferencia(self, origem, destino, valor, descricao):
+        """Uma tentativa de transferência: leitura, cálculo e gravação condicionada às versões lidas"""
+        contas = self._ler_saldos_versoes((origem, destino))
+        if origem not in contas:
+            return None, "Conta de origem não encontrada"
+        if destino not in contas:
+            return None, "Conta de destino não encontrada"
+        
+        numero_origem, saldo_origem, versao_origem = contas[origem]
+        numero_destino, saldo_destino, versao_destino = contas[destino]
+        if valor > saldo_origem:
+            return None, "Saldo insuficiente"
+        novo_saldo_origem = saldo_origem - valor
+        
+        # Cada lado vê no próprio histórico só o número mascarado da outra conta
+        mascarar = self.seguranca.mascarar_dados_sensveis
+        atualizacoes = (
+            (origem, versao_origem, self.seguranca.criptografar_dados(str(novo_saldo_origem)),
+             "TRANSFERENCIA_ENVIADA", descricao or f"Transferência para a conta {mascarar(numero_destino, 'conta')}"),
+            (destino, versao_destino, self.seguranca.criptografar_dados(str(saldo_destino + valor)),
+             "TRANSFERENCIA_RECEBIDA", descricao or f"Transferência da conta {mascarar(numero_origem, 'conta')}"),
+        )
+        self._executar_escrita(lambda cursor: self._transferir_cursor(cursor, atualizacoes, valor))
+        
+        self.registrar_auditoria(numero_origem, "TRANSFERENCIA", True)
+        return novo_saldo_origem, f"Transferência de R$ {valor:.2f} realizada com sucesso"
+    
+    def _ler_saldos_versoes(self, contas_ids):
+        """Lê {conta_id: (numero_conta, saldo, versao)} sem abrir transação de escrita"""
+        conn = self.conectar_leitura()
+        
+        try:
+            marcadores = ", ".join("?" for _ in contas_ids)
+            linhas = conn.execute(f"""
+                SELECT id, numero_conta, saldo_criptografado, versao FROM contas WHERE id IN ({marcadores})
+            """, list(contas_ids)).fetchall()
+        finally:
+            conn.close()
+        
+        saldos = self.seguranca.descriptografar_lote(linha[2] for linha in linhas)
+        return {
+            conta_id: (numero_conta, float(saldo) if saldo else 0.0, versao)
+            for (conta_id, numero_conta, _, versao), saldo in zip(linhas, saldos)
+        }
+    
+    def _transferir_cursor(self, cursor, atualizacoes, valor):
+        """Grava as duas pontas se as versões lidas ainda forem as atuais (senão, _ConflitoVersao)"""
+        for conta_id, versao, saldo_criptografado, _, _ in atualizacoes:
+            cursor.execute("""
+                UPDATE contas SET saldo_criptografado = ?, versao = versao + 1 WHERE id = ? AND versao = ?
+            """, (saldo_criptografado, conta_id, versao))
+            if cursor.rowcount != 1:
+                raise _ConflitoVersao(conta_id)  # Desfaz também a ponta já gravada
+        for conta_id, _, _, tipo, descricao in atualizacoes:
+            self._inserir_transacao(cursor, conta_id, tipo, valor, descricao)
+    
+    def _executar_escrita(self, operacao):
+        """Executa operacao(cursor) em uma transação de escrita: no lote do commit em grupo, se ativo"""
+        if self.commit_em_grupo is not None:
+            return self.commit_em_grupo.executar(operacao)
+        return self._executar_escrita_isolada(operacao)
+    
+    @repetir_se_ocupado
+    def _executar_escrita_isolada(self, operacao):
+        """Executa operacao(cursor) sob BEGIN IMMEDIATE e confirma (um commit por operação)"""
         conn = self.conectar()
         cursor = conn.cursor()
         
         try:
-            saldo_criptografado = self.seguranca.criptografar_dados(str(novo_saldo))
-            cursor.execute("UPDATE contas SET saldo_criptografado = ? WHERE id = ?", (saldo_criptografado, conta_id))
+            # Trava de escrita desde a leitura: nenhum outro escritor altera os dados no meio
+            cursor.execute("BEGIN IMMEDIATE")
+            resultado = operacao(cursor)
             conn.commit()
-        except Exception as e:
+            return resultado
+        except Exception:
             conn.rollback()
-            raise e
+            raise
         finally:
             conn.close()
     
     def registrar_transacao(self, conta_id, tipo, valor, descricao=""):
         """Registra uma transação no banco de forma segura"""
+        self._executar_escrita(
+            lambda cursor: self._inserir_transacao(cursor, conta_id, tipo, valor, descricao)
+        )
+    
+    def _inserir_transacao(self, cursor, conta_id, tipo, valor, descricao):
+        """Insere a transação no livro e grava um checkpoint de saldo a cada N transações"""
+        cursor.execute("""
+            INSERT INTO transacoes (conta_id, tipo, valor_criptografado, descricao_criptografada)
+            VALUES (?, ?, ?, ?)
+        """, (conta_id, tipo, self.seguranca.criptografar_dados(str(valor)),
+              self.seguranca.criptografar_dados(descricao)))
+        transacao_id = cursor.lastrowid
+        
+        cursor.execute("SELECT MAX(transacao_id) FROM saldos_checkpoint WHERE conta_id = ?", (conta_id,))
+        desde_id = cursor.fetchone()[0] or 0
+        # Contagem limitada ao intervalo: custo constante, qualquer que seja o tamanho do livro
+        cursor.execute("""
+            SELECT COUNT(*) FROM (SELECT 1 FROM transacoes WHERE conta_id = ? AND id > ? LIMIT ?)
+        """, (conta_id, desde_id, self.intervalo_checkpoint))
+        if cursor.fetchone()[0] >= self.intervalo_checkpoint:
+            self._gravar_checkpoint(cursor, conta_id)
+        return transacao_id
+    
+    def _ultimo_checkpoint(self, cursor, conta_id, ate_data=None, inclusivo=True):
+        """Último checkpoint (transacao_id, saldo) da conta, opcionalmente até uma data"""
+        if ate_data is None:
+            cursor.execute("""
+                SELECT transacao_id, saldo_criptografado FROM saldos_checkpoint
+                WHERE conta_id = ? ORDER BY transacao_id DESC LIMIT 1
+            """, (conta_id,))
+        else:
+            operador = "<=" if inclusivo else "<"
+            cursor.execute(f"""
+                SELECT transacao_id, saldo_criptografado FROM saldos_checkpoint
+                WHERE conta_id = ? AND data_transacao {operador} ?
+                ORDER BY data_transacao DESC, transacao_id DESC LIMIT 1
+            """, (conta_id, ate_data))
+        linha = cursor.fetchone()
+        if not linha:
+            return None
+        saldo_str = self.seguranca.descriptografar_dados(linha[1])
+        return linha[0], float(saldo_str) if saldo_str else 0.0
+    
+    def _saldo_do_livro(self, cursor, conta_id, ate_data=None, inclusivo=True):
+        """Saldo derivado do livro: último checkpoint + transações posteriores; retorna (saldo, ultimo_id)"""
+        checkpoint = self._ultimo_checkpoint(cursor, conta_id, ate_data, inclusivo)
+        desde_id, saldo = checkpoint if checkpoint else (0, 0.0)
+        
+        condicoes = ["conta_id = ?", "id > ?"]
+        parametros = [conta_id, desde_id]
+        if ate_data is not None:
+            condicoes.append(f"data_transacao {'<=' if inclusivo else '<'} ?")
+            parametros.append(ate_data)
+        cursor.execute(f"""
+            SELECT id, tipo, valor_criptografado FROM transacoes
+            WHERE {' AND '.join(condicoes)} ORDER BY id
+        """, parametros)
+        cauda = cursor.fetchall()
+        
+        if ate_data is not None:
+            # Saldo numa data passada: a cauda pode incluir meses já arquivados
+            for arquivo in self._arquivos_do_periodo(cursor, data_fim=ate_data, desde_id=desde_id):
+                with self._anexar_arquivo(cursor.connection, arquivo[1]) as apelido:
+                    cursor.execute(f"""
+                        SELECT id, tipo, valor_criptografado FROM {apelido}.transacoes
+                        WHERE {' AND '.join(condicoes)} ORDER BY id
+                    """, parametros)
+                    cauda.extend(cursor.fetchall())
+            cauda.sort()
+        
+        valores = self.seguranca.descriptografar_lote(linha[2] for linha in cauda)
+        for (_, tipo, _), valor in zip(cauda, valores):
+            saldo += SINAL_TIPO_TRANSACAO.get(tipo, 0) * float(valor)
+        
+        ultimo_id = cauda[-1][0] if cauda else desde_id
+        return round(saldo, 2), ultimo_id
+    
+    def _gravar_checkpoint(self, cursor, conta_id):
+        """Grava o saldo atual do livro como checkpoint (dentro da transação do chamador)"""
+        saldo, ultimo_id = self._saldo_do_livro(cursor, conta_id)
+        if ultimo_id == 0:
+            return None
+        cursor.execute("""
+            INSERT OR REPLACE INTO saldos_checkpoint (conta_id, transacao_id, saldo_criptografado, data_transacao)
+            VALUES (?, ?, ?, ?)
+        """, (conta_id, ultimo_id, self.seguranca.criptografar_dados(str(saldo)),
+              self._data_checkpoint(cursor, conta_id, ultimo_id)))
+        return saldo
+    
+    def _data_checkpoint(self, cursor, conta_id, ultimo_id):
+        """Data do checkpoint: a maior data entre as transações que ele soma, não a da última por id
+        
+        Importações gravam transações com datas antigas depois de outras mais novas; datado pela
+        maior data, o checkpoint só serve a saldos em datas que já incluem tudo o que ele soma.
+        Os checkpoints anteriores já carregam essa data (inclusive das transações arquivadas).
+        """
+        cursor.execute("""
+            SELECT MAX(data_transacao) FROM (
+                SELECT MAX(data_transacao) AS data_transacao FROM saldos_checkpoint
+                WHERE conta_id = ? AND transacao_id <= ?
+                UNION ALL
+                SELECT MAX(data_transacao) FROM transacoes
+                WHERE conta_id = ? AND id <= ? AND id > (
+                    SELECT COALESCE(MAX(transacao_id), 0) FROM saldos_checkpoint WHERE conta_id = ? AND transacao_id <= ?
+                )
+            )
+        """, (conta_id, ultimo_id, conta_id, ultimo_id, conta_id, ultimo_id))
+        return cursor.fetchone()[0]
+    
+    @repetir_se_ocupado
+    def registrar_checkpoint(self, conta_id):
+        """Força um checkpoint de saldo da conta; retorna o saldo gravado"""
         conn = self.conectar()
         cursor = conn.cursor()
         
         try:
-            valor_criptografado = self.seguranca.criptografar_dados(str(valor))
-            descricao_criptografada = self.seguranca.criptografar_dados(descricao)
-            
-            cursor.execute("""
-                INSERT INTO transacoes (conta_id, tipo, valor_criptografado, descricao_criptografada) 
-                VALUES (?, ?, ?, ?)
-            """, (conta_id, tipo, valor_criptografado, descricao_criptografada))
+            cursor.execute("BEGIN IMMEDIATE")
+            saldo = self._gravar_checkpoint(cursor, conta_id)
             conn.commit()
-        except Exception as e:
+            return saldo
+        except Exception:
             conn.rollback()
-            raise e
+            raise
+        finally:
+            conn.close()
+    
+    def calcular_saldo(self, conta_id, ate_data=None):
+        """Saldo derivado do livro: atual ou até a data informada (inclusive)"""
+        conn = self.conectar_leitura()
+        
+        try:
+            return self._saldo_do_livro(conn.cursor(), conta_id, self._normalizar_data_fim(ate_data))[0]
         finally:
             conn.close()
     
-    def obter_historico(self, conta_id):
-        """Obtém o histórico de transações descriptografado"""
+    def saldos_periodo(self, conta_id, data_inicio, data_fim):
+        """Saldos de abertura (antes de data_inicio) e fechamento (até data_fim) de um extrato"""
+        conn = self.conectar_leitura()
+        
+        try:
+            cursor = conn.cursor()
+            abertura, _ = self._saldo_do_livro(cursor, conta_id, data_inicio, inclusivo=False)
+            fechamento, _ = self._saldo_do_livro(cursor, conta_id, self._normalizar_data_fim(data_fim))
+            return abertura, fechamento
+        finally:
+            conn.close()
+    
+    def _normalizar_data_fim(self, data_fim):
+        """Data sem hora usada como limite final inclui o dia inteiro"""
+        if data_fim and len(data_fim) == 10:
+            return f"{data_fim} 23:59:59"
+        return data_fim
+    
+    def codificar_cursor_historico(self, data_transacao, id_transacao):
+        """Gera o cursor opaco de paginação a partir de (data_transacao, id)"""
+        return base64.urlsafe_b64encode(f"{data_transacao}|{id_transacao}".encode('utf-8')).decode('ascii')
+    
+    def decodificar_cursor_historico(self, cursor_paginacao):
+        """Converte o cursor opaco de volta em (data_transacao, id)"""
+        try:
+            data_transacao, id_transacao = base64.urlsafe_b64decode(cursor_paginacao.encode('ascii')).decode('utf-8').rsplit('|', 1)
+            return data_transacao, int(id_transacao)
+        except Exception:
+            raise ValueError("Cursor de paginação inválido")
+    
+    def _consulta_historico(self, conta_id, limite=None, antes_de=None, data_inicio=None, data_fim=None,
+                            tabela="transacoes"):
+        """Monta a consulta do histórico (mais recentes primeiro) com filtros e paginação por cursor"""
+        condicoes = ["conta_id = ?"]
+        parametros = [conta_id]
+        
+        if antes_de:
+            data_cursor, id_cursor = self.decodificar_cursor_historico(antes_de)
+            condicoes.append("(data_transacao, id) < (?, ?)")
+            parametros.extend((data_cursor, id_cursor))
+        if data_inicio:
+            condicoes.append("data_transacao >= ?")
+            parametros.append(data_inicio)
+        if data_fim:
+            condicoes.append("data_transacao <= ?")
+            parametros.append(self._normalizar_data_fim(data_fim))
+        
+        sql = f"""
+            SELECT id, tipo, valor_criptografado, data_transacao, descricao_criptografada 
+            FROM {tabela} 
+            WHERE {' AND '.join(condicoes)} 
+            ORDER BY data_transacao DESC, id DESC
+        """
+        if limite is not None:
+            sql += " LIMIT ?"
+            parametros.append(limite)
+        return sql, parametros
+    
+    def _descriptografar_transacoes(self, linhas):
+        """Descriptografa valor e descrição das linhas (id, tipo, valor, data, descrição) em um único lote"""
+        cifrados = []
+        for _, _, valor_criptografado, _, descricao_criptografada in linhas:
+            cifrados.extend((valor_criptografado, descricao_criptografada))
+        decifrados = self.seguranca.descriptografar_lote(cifrados)
+        
+        transacoes = []
+        for i, (_, tipo, _, data_transacao, _) in enumerate(linhas):
+            valor, descricao = decifrados[2 * i], decifrados[2 * i + 1]
+            transacoes.append((tipo, valor, data_transacao, descricao))
+        return transacoes
+    
+    def _linhas_historico(self, conta_id, antes_de=None, data_inicio=None, data_fim=None, tamanho_lote=200):
+        """Linhas cifradas do histórico, mais recentes primeiro, da tabela viva e dos arquivos mensais
+        
+        Cada arquivo só é aberto quando o consumidor chega às datas dele (uma página recente
+        não toca nos arquivos); as linhas são intercaladas por (data_transacao, id).
+        """
+        conn = self.conectar_leitura()
+        
+        try:
+            cursor = conn.cursor()
+            limite_superior = self._normalizar_data_fim(data_fim)
+            if antes_de:
+                data_cursor = self.decodificar_cursor_historico(antes_de)[0]
+                limite_superior = min(limite_superior, data_cursor) if limite_superior else data_cursor
+            arquivos = self._arquivos_do_periodo(cursor, data_inicio, limite_superior)
+            
+            cursor.execute(*self._consulta_historico(conta_id, None, antes_de, data_inicio, data_fim))
+            vivas = iter(lambda: cursor.fetchmany(tamanho_lote), [])
+            lote_vivo = iter(next(vivas, []))
+            atual = next(lote_vivo, None)
+            
+            def avancar():
+                nonlocal lote_vivo
+                linha = next(lote_vivo, None)
+                if linha is None:
+                    lote_vivo = iter(next(vivas, []))
+                    linha = next(lote_vivo, None)
+                return linha
+            
+            for _, caminho, _, data_fim_arquivo in arquivos:
+                # Linhas vivas mais novas que todo o mês arquivado saem antes de abri-lo
+                while atual is not None and atual[3] > data_fim_arquivo:
+                    yield atual
+                    atual = avancar()
+                
+                # Conexão própria do arquivo, fora do pool: esta leitura já ocupa uma conexão do pool,
+                # e pedir uma segunda esgotaria o pool com leituras concorrentes (todas esperando)
+                conn_arquivo = sqlite3.connect(uri_somente_leitura(caminho), uri=True)
+                try:
+                    cursor_arquivo = conn_arquivo.cursor()
+                    cursor_arquivo.execute(*self._consulta_historico(conta_id, None, antes_de, data_inicio, data_fim))
+                    for linhas in iter(lambda: cursor_arquivo.fetchmany(tamanho_lote), []):
+                        for linha in linhas:
+                            while atual is not None and (atual[3], atual[0]) > (linha[3], linha[0]):
+                                yield atual
+                                atual = avancar()
+                            yield linha
+                finally:
+                    conn_arquivo.close()
+            
+            while atual is not None:
+                yield atual
+                atual = avancar()
+        finally:
+            conn.close()
+    
+    def obter_historico(self, conta_id, limite=None, antes_de=None, data_inicio=None, data_fim=None):
+        """Obtém o histórico de transações descriptografado (opcionalmente paginado e filtrado)"""
+        linhas = self._linhas_historico(conta_id, antes_de, data_inicio, data_fim)
+        
+        try:
+            return self._descriptografar_transacoes(list(islice(linhas, limite)))
+        finally:
+            linhas.close()
+    
+    def iterar_historico(self, conta_id, data_inicio=None, data_fim=None, tamanho_lote=200):
+        """Percorre o histórico sob demanda: lê com fetchmany e descriptografa lote a lote"""
+        linhas = self._linhas_historico(conta_id, data_inicio=data_inicio, data_fim=data_fim, tamanho_lote=tamanho_lote)
+        
+        try:
+            while True:
+                lote = list(islice(linhas, tamanho_lote))
+                if not lote:
+                    break
+                yield from self._descriptografar_transacoes(lote)
+        finally:
+            linhas.close()
+    
+    def exportar_historico(self, conta_id, caminho_arquivo, data_inicio=None, data_fim=None):
+        """Exporta o histórico para CSV em fluxo (memória constante); retorna o total de linhas"""
+        total = 0
+        with open(caminho_arquivo, 'w', newline='', encoding='utf-8') as arquivo:
+            escritor = csv.writer(arquivo)
+            escritor.writerow(['data', 'tipo', 'valor', 'descricao'])
+            for tipo, valor, data_transacao, descricao in self.iterar_historico(conta_id, data_inicio, data_fim):
+                escritor.writerow([data_transacao, tipo, valor, descricao])
+                total += 1
+        return total
+    
+    def importar_transacoes(self, caminho_arquivo, conta_id=None, tamanho_lote=1000):
+        """Importa transações de um CSV ou JSONL em fluxo, retomando do último lote confirmado
+        
+        Cada linha tem tipo, valor e, opcionalmente, data e descricao; a conta vem da coluna
+        conta_id ou numero_conta (ou do parâmetro conta_id, para arquivos de uma só conta,
+        como os gerados por exportar_historico). Os saldos das contas afetadas são
+        recalculados a partir do livro uma única vez, no final.
+        """
+        assinatura = self._assinatura_arquivo(caminho_arquivo)
+        importacao_id, ja_confirmadas, concluida = self._iniciar_importacao(caminho_arquivo, assinatura)
+        resumo = {'importadas': 0, 'rejeitadas': 0, 'retomada_de': ja_confirmadas, 'erros': []}
+        if concluida:
+            resumo['mensagem'] = "Arquivo já importado"
+            return resumo
+        
+        linhas = islice(self._ler_arquivo_importacao(caminho_arquivo), ja_confirmadas, None)
+        lote = []
+        for linha in linhas:
+            lote.append(linha)
+            if len(lote) >= tamanho_lote:
+                self._importar_lote(importacao_id, lote, conta_id, resumo)
+                lote = []
+        if lote:
+            self._importar_lote(importacao_id, lote, conta_id, resumo)
+        
+        resumo['contas_atualizadas'] = self._executar_escrita_isolada(
+            lambda cursor: self._concluir_importacao(cursor, importacao_id)
+        )
+        resumo['mensagem'] = f"{resumo['importadas']} transações importadas, {resumo['rejeitadas']} rejeitadas"
+        self.seguranca.log_acesso("IMPORTACAO", f"IMPORTACAO_{os.path.basename(caminho_arquivo)}", True)
+        return resumo
+    
+    def _assinatura_arquivo(self, caminho_arquivo):
+        """SHA-256 do conteúdo: identifica o arquivo na retomada, mesmo se for renomeado"""
+        resumo = hashlib.sha256()
+        with open(caminho_arquivo, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+                resumo.update(bloco)
+        return resumo.hexdigest()
+    
+    @repetir_se_ocupado
+    def _iniciar_importacao(self, caminho_arquivo, assinatura):
+        """Registra a importação (ou localiza a interrompida); retorna (id, linhas_confirmadas, concluida)"""
         conn = self.conectar()
         cursor = conn.cursor()
         
         try:
-            cursor.execute("""
-                SELECT tipo, valor_criptografado, data_transacao, descricao_criptografada 
-                FROM transacoes 
-                WHERE conta_id = ? 
-                ORDER BY data_transacao DESC
-            """, (conta_id,))
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("INSERT OR IGNORE INTO importacoes (arquivo, assinatura) VALUES (?, ?)",
+                           (os.path.abspath(caminho_arquivo), assinatura))
+            cursor.execute("SELECT id, linhas_confirmadas, concluida FROM importacoes WHERE assinatura = ?",
+                           (assinatura,))
+            importacao = cursor.fetchone()
+            conn.commit()
+            return importacao[0], importacao[1], bool(importacao[2])
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _ler_arquivo_importacao(self, caminho_arquivo):
+        """Lê o arquivo linha a linha: dicionários (CSV com cabeçalho) ou a exceção de uma linha JSONL inválida"""
+        with open(caminho_arquivo, 'r', newline='', encoding='utf-8') as arquivo:
+            if caminho_arquivo.lower().endswith(('.jsonl', '.ndjson')):
+                for texto in arquivo:
+                    if not texto.strip():
+                        continue
+                    try:
+                        yield json.loads(texto)
+                    except ValueError as e:
+                        yield e
+            else:
+                yield from csv.DictReader(arquivo)
+    
+    def _validar_linha_importacao(self, linha, conta_padrao):
+        """Valida uma linha do arquivo; retorna ((conta, tipo, valor, data, descricao), None) ou (None, erro)"""
+        if isinstance(linha, Exception) or not isinstance(linha, dict):
+            return None, "Linha inválida"
+        
+        conta = linha.get('conta_id') or linha.get('numero_conta') or conta_padrao
+        if not conta:
+            return None, "Conta não informada"
+        if linha.get('conta_id') or (conta_padrao and not linha.get('numero_conta')):
+            try:
+                conta = int(conta)
+            except (TypeError, ValueError):
+                return None, "conta_id deve ser numérico"
+        else:
+            conta = str(conta).strip()
+        
+        tipo = str(linha.get('tipo') or '').strip().upper()
+        if tipo not in SINAL_TIPO_TRANSACAO:
+            return None, f"Tipo de transação inválido: {tipo or 'vazio'}"
+        
+        valido, valor = self.seguranca.validar_entrada_segura(str(linha.get('valor') or ''), "valor")
+        if not valido:
+            return None, valor
+        valor = float(valor)
+        if not math.isfinite(valor) or valor <= 0:
+            return None, "Valor deve ser positivo"
+        
+        data_transacao = linha.get('data') or linha.get('data_transacao')
+        if data_transacao:
+            try:
+                data_transacao = datetime.fromisoformat(str(data_transacao).strip()).strftime('%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                return None, f"Data inválida: {data_transacao}"
+        else:
+            data_transacao = None
+        
+        descricao = linha.get('descricao') or ''
+        if descricao:
+            valido, descricao = self.seguranca.validar_entrada_segura(str(descricao))
+            if not valido:
+                return None, descricao
+        
+        return (conta, tipo, valor, data_transacao, descricao), None
+    
+    def _importar_lote(self, importacao_id, lote, conta_padrao, resumo):
+        """Valida, criptografa e grava um lote, avançando o progresso na mesma transação"""
+        validas = []
+        for linha in lote:
+            dados, erro = self._validar_linha_importacao(linha, conta_padrao)
+            numero_linha = resumo['retomada_de'] + resumo['importadas'] + resumo['rejeitadas'] + 1
+            if erro:
+                resumo['rejeitadas'] += 1
+                if len(resumo['erros']) < LIMITE_ERROS_IMPORTACAO:
+                    resumo['erros'].append((numero_linha, erro))
+            else:
+                validas.append((numero_linha, dados))
+                resumo['importadas'] += 1
+        
+        # Criptografia fora da transação de escrita
+        cifradas = [
+            (numero_linha, conta, tipo, self.seguranca.criptografar_dados(str(valor)), data_transacao,
+             self.seguranca.criptografar_dados(descricao))
+            for numero_linha, (conta, tipo, valor, data_transacao, descricao) in validas
+        ]
+        
+        def gravar(cursor):
+            # Resolver as contas do lote (id ou número) em uma consulta por tipo de referência
+            ids = {conta for _, conta, *_ in cifradas if isinstance(conta, int)}
+            numeros = {conta for _, conta, *_ in cifradas if isinstance(conta, str)}
+            contas = {}
+            for coluna, valores in (('id', ids), ('numero_conta', numeros)):
+                valores = list(valores)
+                for i in range(0, len(valores), 500):
+                    bloco = valores[i:i + 500]
+                    marcadores = ", ".join("?" for _ in bloco)
+                    cursor.execute(f"SELECT {coluna}, id FROM contas WHERE {coluna} IN ({marcadores})", bloco)
+                    contas.update(cursor.fetchall())
             
-            transacoes_criptografadas = cursor.fetchall()
-            transacoes_descriptografadas = []
+            registros = []
+            rejeitadas = []
+            for numero_linha, conta, tipo, valor, data_transacao, descricao in cifradas:
+                if conta not in contas:
+                    rejeitadas.append((numero_linha, f"Conta não encontrada: {conta}"))
+                    continue
+                registros.append((contas[conta], tipo, valor, data_transacao, descricao))
             
-            for transacao in transacoes_criptografadas:
-                tipo, valor_criptografado, data_transacao, descricao_criptografada = transacao
-                
-                # Descriptografar dados
-                valor = self.seguranca.descriptografar_dados(valor_criptografado)
-                descricao = self.seguranca.descriptografar_dados(descricao_criptografada)
+            cursor.executemany("""
+                INSERT INTO transacoes (conta_id, tipo, valor_criptografado, data_transacao, descricao_criptografada)
+                VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+            """, registros)
+            # Data mais antiga importada por conta (sem data, a transação entra com a data atual)
+            agora = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            datas_minimas = {}
+            for conta, _, _, data_transacao, _ in registros:
+                data_transacao = data_transacao or agora
+                datas_minimas[conta] = min(datas_minimas.get(conta, data_transacao), data_transacao)
+            cursor.executemany("""
+                INSERT INTO importacoes_contas (importacao_id, conta_id, data_minima) VALUES (?, ?, ?)
+                ON CONFLICT (importacao_id, conta_id)
+                DO UPDATE SET data_minima = MIN(COALESCE(data_minima, excluded.data_minima), excluded.data_minima)
+            """, [(importacao_id, conta, data_minima) for conta, data_minima in datas_minimas.items()])
+            cursor.execute("""
+                UPDATE importacoes
+                SET linhas_confirmadas = linhas_confirmadas + ?, linhas_importadas = linhas_importadas + ?,
+                    linhas_rejeitadas = linhas_rejeitadas + ?, data_atualizacao = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (len(lote), len(registros), len(lote) - len(registros), importacao_id))
+            return rejeitadas
+        
+        rejeitadas = self._executar_escrita_isolada(gravar)
+        resumo['importadas'] -= len(rejeitadas)
+        resumo['rejeitadas'] += len(rejeitadas)
+        resumo['erros'].extend(rejeitadas[:max(0, LIMITE_ERROS_IMPORTACAO - len(resumo['erros']))])
+    
+    def _concluir_importacao(self, cursor, importacao_id):
+        """Recalcula pelo livro o saldo de cada conta afetada e marca a importação como concluída"""
+        cursor.execute("SELECT conta_id, data_minima FROM importacoes_contas WHERE importacao_id = ?", (importacao_id,))
+        contas = cursor.fetchall()
+        for conta, data_minima in contas:
+            saldo = self._gravar_checkpoint(cursor, conta) or 0.0
+            
+            # Checkpoints datados a partir da transação importada mais antiga podem ter sido gravados
+            # com a data de uma linha retroativa; o checkpoint novo (com a data certa) os substitui
+            cursor.execute("""
+                DELETE FROM saldos_checkpoint
+                WHERE conta_id = ? AND data_transacao >= ?
+                  AND transacao_id < (SELECT MAX(transacao_id) FROM saldos_checkpoint WHERE conta_id = ?)
+            """, (conta, data_minima or "", conta))
+            cursor.execute("UPDATE contas SET saldo_criptografado = ?, versao = versao + 1 WHERE id = ?",
+                           (self.seguranca.criptografar_dados(str(saldo)), conta))
+        cursor.execute("UPDATE importacoes SET concluida = 1, data_atualizacao = CURRENT_TIMESTAMP WHERE id = ?",
+                       (importacao_id,))
+        return len(contas)
+    
+    def arquivar_transacoes(self, dias=365, diretorio=None):
+        """Move as transações com mais de `dias` dias para arquivos SQLite mensais; retorna {mes: linhas movidas}
+        
+        Cada mês vai para diretorio/transacoes_AAAA_MM.db (padrão: pasta arquivo_transacoes ao lado
+        do banco), registrado em arquivos_transacoes. Antes de remover as linhas da tabela viva, cada
+        conta afetada ganha um checkpoint de saldo, então o saldo atual não depende dos arquivos.
+        """
+        limite = (datetime.now(timezone.utc) - timedelta(days=dias)).strftime('%Y-%m-%d %H:%M:%S')
+        if diretorio is None:
+            diretorio = os.path.join(os.path.dirname(os.path.abspath(self.nome_db)), "arquivo_transacoes")
+        os.makedirs(diretorio, exist_ok=True)
+        
+        conn = self.conectar()
+        try:
+            meses = [linha[0] for linha in conn.execute("""
+                SELECT DISTINCT substr(data_transacao, 1, 7) FROM transacoes WHERE data_transacao < ? ORDER BY 1
+            """, (limite,))]
+        finally:
+            conn.close()
+        
+        arquivados = {}
+        for mes in meses:
+            caminho = os.path.join(diretorio, f"transacoes_{mes.replace('-', '_')}.db")
+            arquivados[mes] = self._arquivar_mes(mes, limite, caminho)
+        return arquivados
+    
+    @repetir_se_ocupado
+    def _arquivar_mes(self, mes, limite, caminho):
+        """Copia as linhas do mês para o arquivo e só depois as remove da tabela viva (duas transações)"""
+        filtro = "substr(data_transacao, 1, 7) = ? AND data_transacao < ?"
+        colunas = "id, conta_id, tipo, valor_criptografado, data_transacao, descricao_criptografada"
+        conn = self.conectar()
+        cursor = conn.cursor()
+        
+        try:
+            with self._anexar_arquivo(conn, caminho, somente_leitura=False) as apelido:
+                # 1) Cópia confirmada no arquivo (refazer é seguro: ids já copiados são ignorados)
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {apelido}.transacoes (
+                        id INTEGER PRIMARY KEY,
+                        conta_id INTEGER,
+                        tipo TEXT NOT NULL,
+                        valor_criptografado TEXT NOT NULL,
+                        data_transacao TIMESTAMP,
+                        descricao_criptografada TEXT
+                    )
+                """)
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {apelido}.idx_transacoes_conta_data ON transacoes (conta_id, data_transacao)")
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO {apelido}.transacoes ({colunas})
+                    SELECT {colunas} FROM main.transacoes WHERE {filtro}
+                """, (mes, limite))
+                conn.commit()
                 
-                transacoes_descriptografadas.append((tipo, valor, data_transacao, descricao))
+                # 2) Checkpoints das contas afetadas, remoção da tabela viva e registro do arquivo
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(f"SELECT DISTINCT conta_id FROM main.transacoes WHERE {filtro}", (mes, limite))
+                for (conta_id,) in cursor.fetchall():
+                    self._gravar_checkpoint(cursor, conta_id)
+                cursor.execute(f"""
+                    DELETE FROM main.transacoes WHERE {filtro} AND id IN (SELECT id FROM {apelido}.transacoes)
+                """, (mes, limite))
+                removidas = cursor.rowcount
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO arquivos_transacoes (mes, caminho, data_inicio, data_fim, id_inicio, id_fim, total)
+                    SELECT ?, ?, MIN(data_transacao), MAX(data_transacao), MIN(id), MAX(id), COUNT(*)
+                    FROM {apelido}.transacoes
+                """, (mes, os.path.abspath(caminho)))
+                conn.commit()
+                return removidas
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _arquivos_do_periodo(self, cursor, data_inicio=None, data_fim=None, desde_id=None):
+        """Arquivos mensais que cobrem o período (e ids posteriores a desde_id), do mais recente ao mais antigo"""
+        condicoes = ["1 = 1"]
+        parametros = []
+        if data_inicio:
+            condicoes.append("data_fim >= ?")
+            parametros.append(data_inicio)
+        if data_fim:
+            condicoes.append("data_inicio <= ?")
+            parametros.append(data_fim)
+        if desde_id:
+            condicoes.append("id_fim > ?")
+            parametros.append(desde_id)
+        cursor.execute(f"""
+            SELECT mes, caminho, data_inicio, data_fim FROM arquivos_transacoes
+            WHERE {' AND '.join(condicoes)} ORDER BY mes DESC
+        """, parametros)
+        return cursor.fetchall()
+    
+    @contextmanager
+    def _anexar_arquivo(self, conn, caminho, somente_leitura=True):
+        """Anexa um arquivo mensal à conexão durante o bloco (ATTACH ... DETACH)"""
+        endereco = uri_somente_leitura(caminho) if somente_leitura else caminho
+        conn.execute("ATTACH DATABASE ? AS arquivo_mes", (endereco,))
+        try:
+            yield "arquivo_mes"
+        finally:
+            if conn.in_transaction:
+                conn.rollback()  # DETACH não é permitido com transação aberta
+            conn.execute("DETACH DATABASE arquivo_mes")
+    
+    def rotacionar_chave(self, tamanho_lote=500, remover_chave_antiga=False):
+        """Troca a chave de criptografia e recifra os dados com ela; retorna um resumo
+        
+        Uma nova chave entra à frente do chaveiro (ou é usada a que já estiver lá à frente
+        das antigas) e as antigas continuam decifrando, então o sistema segue legível durante
+        todo o processo. contas (com o índice cego do titular), transacoes, saldos_checkpoint e
+        os arquivos mensais são recifrados em lotes, cada lote uma transação que grava também o
+        progresso em rotacoes_chave_progresso; se for interrompida, a mesma chamada retoma do
+        último lote confirmado. As chaves antigas ficam no chaveiro: sistema.key é compartilhado por
+        todos os bancos do diretório, snapshots e cópias de segurança, que seguiriam cifrados com elas.
+        Só com remover_chave_antiga=True elas saem no final.
+        """
+        rotacao_id, impressao, retomada = self._iniciar_rotacao()
+        
+        recriptografados = {}
+        for alvo, tabela, caminho in self._alvos_rotacao():
+            recriptografados[alvo] = self._recriptografar_alvo(rotacao_id, alvo, tabela, caminho, tamanho_lote)
+        
+        chaves = self.seguranca.chaves.obter_chaves()
+        if self.seguranca.impressao_chave(chaves[0]) != impressao:
+            raise ValueError("O chaveiro mudou durante a rotação; execute novamente para retomar")
+        removidas = 0
+        if remover_chave_antiga and len(chaves) > 1:
+            self.seguranca.gravar_chaveiro(chaves[:1])
+            removidas = len(chaves) - 1
+        
+        conn = self.conectar()
+        try:
+            conn.execute("""
+                UPDATE rotacoes_chave SET concluida = 1, data_atualizacao = CURRENT_TIMESTAMP WHERE id = ?
+            """, (rotacao_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return {
+            'rotacao_id': rotacao_id,
+            'impressao_chave': impressao,
+            'retomada': retomada,
+            'recriptografados': recriptografados,
+            'chaves_removidas': removidas,
+            'mensagem': "Rotação concluída",
+        }
+    
+    def _iniciar_rotacao(self):
+        """Retoma a rotação pendente ou registra uma nova; retorna (rotacao_id, impressao, retomada)"""
+        conn = self.conectar()
+        cursor = conn.cursor()
+        try:
+            chaves = self.seguranca.chaves.obter_chaves()
+            cursor.execute("SELECT id, impressao_chave FROM rotacoes_chave WHERE concluida = 0 ORDER BY id DESC LIMIT 1")
+            pendente = cursor.fetchone()
+            if pendente:
+                if self.seguranca.impressao_chave(chaves[0]) != pendente[1]:
+                    raise ValueError("A chave principal não é a da rotação pendente; restaure o chaveiro antes de retomar")
+                return pendente[0], pendente[1], True
             
-            return transacoes_descriptografadas
-        except Exception as e:
-            return []
+            # Nova chave, salvo se já houver uma à frente das antigas que ainda não foi usada numa rotação
+            # (colocada manualmente ou de uma execução interrompida antes do registro)
+            cursor.execute("SELECT 1 FROM rotacoes_chave WHERE impressao_chave = ?",
+                           (self.seguranca.impressao_chave(chaves[0]),))
+            if len(chaves) == 1 or cursor.fetchone():
+                chaves = [self.seguranca.adicionar_chave_principal()] + chaves
+            
+            # Outros processos relêem o chaveiro a cada intervalo_verificacao: depois da espera,
+            # tudo o que for gravado já sai com a nova chave
+            time.sleep(self.seguranca.chaves.intervalo_verificacao)
+            
+            impressao = self.seguranca.impressao_chave(chaves[0])
+            cursor.execute("INSERT INTO rotacoes_chave (impressao_chave) VALUES (?)", (impressao,))
+            conn.commit()
+            return cursor.lastrowid, impressao, False
+        finally:
+            conn.close()
+    
+    def _alvos_rotacao(self):
+        """Tabelas do banco e arquivos mensais a recifrar: (alvo, tabela, caminho do arquivo ou None)"""
+        alvos = [(tabela, tabela, None) for tabela in COLUNAS_CRIPTOGRAFADAS]
+        conn = self.conectar()
+        try:
+            for mes, caminho in conn.execute("SELECT mes, caminho FROM arquivos_transacoes ORDER BY mes"):
+                alvos.append((f"arquivo:{mes}", 'transacoes', caminho))
+        finally:
+            conn.close()
+        return alvos
+    
+    @repetir_se_ocupado
+    def _recriptografar_alvo(self, rotacao_id, alvo, tabela, caminho, tamanho_lote):
+        """Recifra uma tabela (ou arquivo mensal) em lotes a partir do último id confirmado"""
+        colunas = COLUNAS_CRIPTOGRAFADAS[tabela]
+        atribuicoes = ", ".join(f"{coluna} = ?" for coluna in colunas)
+        if tabela == 'contas':
+            atribuicoes += ", titular_indice = COALESCE(?, titular_indice)"
+        
+        conn = self.conectar()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("INSERT OR IGNORE INTO rotacoes_chave_progresso (rotacao_id, alvo) VALUES (?, ?)",
+                           (rotacao_id, alvo))
+            conn.commit()
+            cursor.execute("""
+                SELECT ultimo_id, recriptografados, concluido FROM rotacoes_chave_progresso
+                WHERE rotacao_id = ? AND alvo = ?
+            """, (rotacao_id, alvo))
+            ultimo_id, total, concluido = cursor.fetchone()
+            if concluido:
+                return total
+            
+            anexo = self._anexar_arquivo(conn, caminho, somente_leitura=False) if caminho else nullcontext("main")
+            with anexo as esquema:
+                chave = self.seguranca.obter_chave_criptografia()
+                while True:
+                    # Leitura, recifragem e escrita na mesma transação: nenhuma escrita concorrente se perde
+                    cursor.execute("BEGIN IMMEDIATE")
+                    cursor.execute(f"""
+                        SELECT id, {', '.join(colunas)} FROM {esquema}.{tabela} WHERE id > ? ORDER BY id LIMIT ?
+                    """, (ultimo_id, tamanho_lote))
+                    linhas = cursor.fetchall()
+                    if not linhas:
+                        cursor.execute("""
+                            UPDATE rotacoes_chave_progresso SET concluido = 1 WHERE rotacao_id = ? AND alvo = ?
+                        """, (rotacao_id, alvo))
+                        conn.commit()
+                        return total
+                    
+                    resultados = self.seguranca.recriptografar_lote(valor for linha in linhas for valor in linha[1:])
+                    atualizacoes = []
+                    for posicao, linha in enumerate(linhas):
+                        recifrados = resultados[posicao * len(colunas):(posicao + 1) * len(colunas)]
+                        if all(recifrado is None for recifrado in recifrados):
+                            continue
+                        novos = [recifrado[0] if recifrado else antigo for recifrado, antigo in zip(recifrados, linha[1:])]
+                        if tabela == 'contas':
+                            # Índice cego refeito com a nova chave junto com o titular
+                            titular = recifrados[0]
+                            novos.append(self.seguranca.calcular_indice_cego(titular[1], chave) if titular else None)
+                        atualizacoes.append((*novos, linha[0]))
+                    
+                    if atualizacoes:
+                        cursor.executemany(f"UPDATE {esquema}.{tabela} SET {atribuicoes} WHERE id = ?", atualizacoes)
+                    total += len(atualizacoes)
+                    ultimo_id = linhas[-1][0]
+                    cursor.execute("""
+                        UPDATE rotacoes_chave_progresso SET ultimo_id = ?, recriptografados = ?
+                        WHERE rotacao_id = ? AND alvo = ?
+                    """, (ultimo_id, total, rotacao_id, alvo))
+                    cursor.execute("UPDATE rotacoes_chave SET data_atualizacao = CURRENT_TIMESTAMP WHERE id = ?",
+                                   (rotacao_id,))
+                    conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         finally:
             conn.close()
     
+    def obter_pagina_historico(self, conta_id, limite=50, antes_de=None, data_inicio=None, data_fim=None):
+        """Obtém uma página do histórico; retorna (transacoes, proximo_cursor ou None)"""
+        if antes_de:
+            self.decodificar_cursor_historico(antes_de)  # ValueError se inválido
+        
+        fonte = self._linhas_historico(conta_id, antes_de, data_inicio, data_fim, tamanho_lote=limite + 1)
+        
+        try:
+            # Uma linha a mais indica se existe próxima página
+            linhas = list(islice(fonte, limite + 1))
+            
+            proximo_cursor = None
+            if len(linhas) > limite:
+                linhas = linhas[:limite]
+                ultima = linhas[-1]
+                proximo_cursor = self.codificar_cursor_historico(ultima[3], ultima[0])
+            
+            # Só as linhas da página são descriptografadas
+            return self._descriptografar_transacoes(linhas), proximo_cursor
+        finally:
+            fonte.close()
+    
     def listar_contas_seguro(self):
         """Lista contas com dados mascarados para administradores"""
-        conn = self.conectar()
+        conn = self.conectar_leitura()
         cursor = conn.cursor()
         
         try:
@@ -299,11 +1595,13 @@ class BancoDados:
             contas_criptografadas = cursor.fetchall()
             contas_mascaradas = []
             
-            for conta in contas_criptografadas:
-                id_conta, numero_conta, titular_criptografado, data_criacao, bloqueada = conta
+            # Descriptografar todos os titulares em um único lote
+            titulares = self.seguranca.descriptografar_lote(conta[2] for conta in contas_criptografadas)
+            
+            for conta, titular in zip(contas_criptografadas, titulares):
+                id_conta, numero_conta, _, data_criacao, bloqueada = conta
                 
-                # Descriptografar e mascarar dados
-                titular = self.seguranca.descriptografar_dados(titular_criptografado)
+                # Mascarar dados
                 titular_mascarado = self.seguranca.mascarar_dados_sensveis(titular, "nome")
                 numero_mascarado = self.seguranca.mascarar_dados_sensveis(numero_conta, "conta")
                 status = "BLOQUEADA" if bloqueada else "ATIVA"
@@ -317,8 +1615,8 @@ class BancoDados:
             conn.close()
     
     def buscar_conta_por_id(self, conta_id):
-        """Busca conta por ID para operações internas"""
-        conn = self.conectar()
+        """Busca conta por ID para operações internas (RegistroConta com descriptografia sob demanda)"""
+        conn = self.conectar_leitura()
         cursor = conn.cursor()
         
         try:
@@ -329,20 +1627,8 @@ class BancoDados:
             
             resultado = cursor.fetchone()
             if resultado:
-                id_conta, numero_conta, titular_criptografado, saldo_criptografado, bloqueada = resultado
-                
-                # Descriptografar dados
-                titular = self.seguranca.descriptografar_dados(titular_criptografado)
-                saldo_str = self.seguranca.descriptografar_dados(saldo_criptografado)
-                saldo = float(saldo_str) if saldo_str else 0.0
-                
-                return {
-                    'id': id_conta,
-                    'numero_conta': numero_conta,
-                    'titular': titular,
-                    'saldo': saldo,
-                    'bloqueada': bool(bloqueada)
-                }
+                # Titular e saldo são descriptografados só se (e quando) forem usados
+                return RegistroConta(self.seguranca, *resultado)
             return None
         except Exception:
             return None
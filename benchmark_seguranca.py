@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark do módulo de segurança (custo por chamada de criptografia)
+"""
+
+import os
+import tempfile
+import time
+import base64
+from cryptography.fernet import Fernet
+from seguranca import Seguranca
+
+ITERACOES = 5000
+RODADAS = 3
+
+def medir(funcao, iteracoes=ITERACOES, rodadas=RODADAS):
+    """Retorna o melhor custo médio por chamada (µs) entre as rodadas"""
+    melhor = float('inf')
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        for _ in range(iteracoes):
+            funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor / iteracoes * 1_000_000
+
+def benchmark_chave_em_cache(diretorio):
+    """Compara a leitura da chave a cada chamada com a cifra em cache"""
+    chave_arquivo = os.path.join(diretorio, "benchmark.key")
+    seguranca = Seguranca(chave_arquivo, cifra="fernet")
+    cifrado = seguranca.criptografar_dados("1500.75")
+    with open(chave_arquivo, 'rb') as arquivo:
+        cifrado_antigo = base64.b64encode(Fernet(arquivo.read()).encrypt(b"1500.75")).decode('utf-8')
+
+    # Comportamento antigo: abre o arquivo e cria um Fernet por chamada
+    def criptografar_antigo():
+        with open(chave_arquivo, 'rb') as arquivo:
+            fernet = Fernet(arquivo.read())
+        base64.b64encode(fernet.encrypt(b"1500.75")).decode('utf-8')
+
+    def descriptografar_antigo():
+        with open(chave_arquivo, 'rb') as arquivo:
+            fernet = Fernet(arquivo.read())
+        fernet.decrypt(base64.b64decode(cifrado_antigo.encode('utf-8'))).decode('utf-8')
+
+    antes_cripto = medir(criptografar_antigo)
+    antes_decripto = medir(descriptografar_antigo)
+    depois_cripto = medir(lambda: seguranca.criptografar_dados("1500.75"))
+    depois_decripto = medir(lambda: seguranca.descriptografar_dados(cifrado))
+
+    print("🔑 === CHAVE EM CACHE (µs por chamada) ===")
+    print(f"{'Operação':16} | {'Antes':>10} | {'Depois':>10} | Ganho")
+    print("-" * 52)
+    print(f"{'Criptografar':16} | {antes_cripto:10.1f} | {depois_cripto:10.1f} | {antes_cripto / depois_cripto:.1f}x")
+    print(f"{'Descriptografar':16} | {antes_decripto:10.1f} | {depois_decripto:10.1f} | {antes_decripto / depois_decripto:.1f}x")
+
+# Valores típicos de cada campo criptografado do esquema
+CAMPOS_ESQUEMA = [
+    ("saldo", "1500.75"),
+    ("valor", "250.00"),
+    ("titular", "Maria Aparecida da Silva Souza"),
+    ("descricao", "Transferência recebida da conta 48213907"),
+]
+
+def benchmark_suites_cifra(diretorio):
+    """Compara Fernet e AES-GCM nos tamanhos de campo que o esquema grava"""
+    chave_arquivo = os.path.join(diretorio, "suites.key")
+    suites = {nome: Seguranca(chave_arquivo, cifra=nome) for nome in ("fernet", "aes-gcm")}
+
+    print("\n🔐 === SUÍTES DE CIFRA POR CAMPO (µs por chamada) ===")
+    print(f"{'Campo':10} | {'Suíte':8} | {'Bytes':>5} | {'Cripto':>7} | {'Decripto':>8} | {'Vazão (campos/s)':>16}")
+    print("-" * 72)
+    for campo, valor in CAMPOS_ESQUEMA:
+        medidas = {}
+        for nome, seguranca in suites.items():
+            cifrado = seguranca.criptografar_dados(valor)
+            cripto = medir(lambda: seguranca.criptografar_dados(valor))
+            decripto = medir(lambda: seguranca.descriptografar_dados(cifrado))
+            medidas[nome] = (cripto, decripto)
+            vazao = 1_000_000 / (cripto + decripto)
+            print(f"{campo:10} | {nome:8} | {len(cifrado):5} | {cripto:7.1f} | {decripto:8.1f} | {vazao:16,.0f}")
+        (fernet_cripto, fernet_decripto), (gcm_cripto, gcm_decripto) = medidas["fernet"], medidas["aes-gcm"]
+        print(f"{'':10} | {'ganho':8} | {'':5} | {fernet_cripto / gcm_cripto:6.1f}x | {fernet_decripto / gcm_decripto:7.1f}x |")
+
+def main():
+    print("⏱️  === BENCHMARK DE SEGURANÇA ===")
+    print(f"🔁 {ITERACOES} iterações x {RODADAS} rodadas por medida\n")
+    with tempfile.TemporaryDirectory() as diretorio:
+        benchmark_chave_em_cache(diretorio)
+        benchmark_suites_cifra(diretorio)
+
+if __name__ == "__main__":
+    main()
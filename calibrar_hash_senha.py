@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Calibra o custo do hash de senha (iterações do PBKDF2-HMAC-SHA256) para a
+máquina atual: mede a derivação e sugere o número de iterações que leva
+cerca do tempo alvo por hash. Aplique o resultado com a variável de
+ambiente BANCO_PBKDF2_ITERACOES; senhas com custo menor são refeitas no
+próximo login.
+
+Uso: python calibrar_hash_senha.py [--alvo-ms 250]
+"""
+
+import argparse
+import os
+import time
+from seguranca import ITERACOES_SENHA_PADRAO, derivar_senha
+
+ITERACOES_AMOSTRA = 100_000
+ITERACOES_MINIMAS = 100_000
+RODADAS = 5
+
+def medir_derivacao(iteracoes, rodadas=RODADAS):
+    """Retorna o menor tempo (s) de uma derivação com o número de iterações informado"""
+    melhor = float('inf')
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        derivar_senha("senha de calibracao", "salt de calibracao", iteracoes)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def calibrar_hash_senha(alvo_ms=250):
+    """Mede, calcula as iterações para o alvo e confirma a latência obtida"""
+    print("⏱️  === CALIBRAÇÃO DO HASH DE SENHA ===")
+    print(f"🎯 Alvo: {alvo_ms} ms por hash\n")
+
+    amostra = medir_derivacao(ITERACOES_AMOSTRA)
+    iteracoes = int(ITERACOES_AMOSTRA * (alvo_ms / 1000) / amostra)
+    iteracoes = max(ITERACOES_MINIMAS, round(iteracoes, -4))
+    obtido = medir_derivacao(iteracoes, rodadas=3)
+
+    atual = int(os.environ.get("BANCO_PBKDF2_ITERACOES", ITERACOES_SENHA_PADRAO))
+    print(f"📏 {ITERACOES_AMOSTRA:,} iterações: {amostra * 1000:.1f} ms")
+    print(f"⚙️  Configuração atual: {atual:,} iterações ({amostra * 1000 * atual / ITERACOES_AMOSTRA:.0f} ms estimados)")
+    print(f"✅ Sugestão: {iteracoes:,} iterações ({obtido * 1000:.0f} ms medidos)")
+    if iteracoes == ITERACOES_MINIMAS and obtido * 1000 > alvo_ms:
+        print(f"⚠️  Máquina lenta para o alvo: mantido o mínimo de {ITERACOES_MINIMAS:,} iterações")
+    print(f"\n👉 export BANCO_PBKDF2_ITERACOES={iteracoes}")
+    return iteracoes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibra as iterações do PBKDF2 para uma latência alvo")
+    parser.add_argument("--alvo-ms", type=int, default=250, help="tempo alvo por hash em ms (padrão: 250)")
+    argumentos = parser.parse_args()
+    calibrar_hash_senha(argumentos.alvo_ms)
@@ -0,0 +1,109 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class CommitEmGrupo:
+    """Agrupa escritas de várias threads em uma única transação (um commit por lote)"""
+
+    def __init__(self, obter_conexao, tamanho_maximo_lote=64, espera_maxima=0.005):
+        self.obter_conexao = obter_conexao
+        self.tamanho_maximo_lote = tamanho_maximo_lote
+        self.espera_maxima = espera_maxima
+
+        self._fila = queue.Queue()
+        self._encerrado = False
+        self._thread = threading.Thread(target=self._executar, name="commit-em-grupo", daemon=True)
+        self._thread.start()
+        atexit.register(self.encerrar)
+
+    def submeter(self, operacao):
+        """Enfileira operacao(cursor) e retorna um Future com o resultado dela"""
+        if self._encerrado:
+            raise RuntimeError("Commit em grupo encerrado")
+        futuro = Future()
+        self._fila.put((operacao, futuro))
+        return futuro
+
+    def executar(self, operacao, timeout=None):
+        """Submete a operação e aguarda o commit do lote em que ela entrou"""
+        return self.submeter(operacao).result(timeout)
+
+    def encerrar(self, timeout=5.0):
+        """Processa o que já foi enfileirado e para a thread"""
+        if self._encerrado:
+            return
+        self._encerrado = True
+        self._fila.put(None)
+        self._thread.join(timeout)
+
+    def _executar(self):
+        """Laço da thread: junta operações por até espera_maxima e confirma o lote"""
+        while True:
+            item = self._fila.get()
+            if item is None:
+                return
+
+            lote = [item]
+            prazo = time.monotonic() + self.espera_maxima
+            encerrar = False
+            while len(lote) < self.tamanho_maximo_lote:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is None:
+                    encerrar = True
+                    break
+                lote.append(item)
+
+            self._confirmar_lote(lote)
+            if encerrar:
+                return
+
+    def _confirmar_lote(self, lote):
+        """Executa o lote em uma transação; cada operação isolada em um SAVEPOINT"""
+        resultados = []
+        try:
+            conn = self.obter_conexao()
+        except Exception as erro:
+            for _, futuro in lote:
+                futuro.set_exception(erro)
+            return
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for operacao, futuro in lote:
+                # A falha de uma operação desfaz só o que ela escreveu
+                cursor.execute("SAVEPOINT operacao")
+                try:
+                    resultados.append((futuro, operacao(cursor), None))
+                    cursor.execute("RELEASE SAVEPOINT operacao")
+                except Exception as erro:
+                    cursor.execute("ROLLBACK TO SAVEPOINT operacao")
+                    cursor.execute("RELEASE SAVEPOINT operacao")
+                    resultados.append((futuro, None, erro))
+            conn.commit()
+        except Exception as erro:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(erro)
+            return
+        finally:
+            conn.close()
+
+        # Só depois do commit os chamadores recebem o resultado
+        for futuro, resultado, erro in resultados:
+            if erro is not None:
+                futuro.set_exception(erro)
+            else:
+                futuro.set_result(resultado)
@@ -6,7 +6,7 @@ Interface gráfica moderna usando Tkinter
 
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from banco_db import BancoDados
+from banco_db import BancoDados, SINAL_TIPO_TRANSACAO
 from main import ContaBancaria
 import datetime
 
@@ -387,7 +387,7 @@ class BancoGUI:
                 valor_formatado = f"R$ {valor_float:.2f}"
                 
                 # Adicionar cor baseada no tipo
-                tag = "deposito" if tipo == "DEPOSITO" else "saque"
+                tag = "deposito" if SINAL_TIPO_TRANSACAO.get(tipo, 0) > 0 else "saque"
                 self.tree_historico.insert('', tk.END, values=(data_formatada, tipo, valor_formatado), tags=(tag,))
             
             # Configurar cores das tags
@@ -463,7 +463,7 @@ class BancoGUI:
                 valor_formatado = f"R$ {valor_float:.2f}"
                 
                 # Inserir
-                tag = "deposito" if tipo == "DEPOSITO" else "saque"
+                tag = "deposito" if SINAL_TIPO_TRANSACAO.get(tipo, 0) > 0 else "saque"
                 tree.insert('', tk.END, values=(data_formatada, tipo, valor_formatado, descricao), tags=(tag,))
             
             # Cores
@@ -537,6 +537,7 @@ class BancoGUI:
             
             # Carregar logs
             try:
+                self.banco.seguranca.descarregar_logs()
                 with open('logs_seguranca.txt', 'r', encoding='utf-8') as f:
                     logs = f.read()
                     text_logs.insert('1.0', logs)
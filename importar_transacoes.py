@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Script para importar transações de outros sistemas a partir de um arquivo
+CSV (com cabeçalho) ou JSONL. Se for interrompido, basta executar de novo com
+o mesmo arquivo: a importação continua do último lote confirmado.
+
+Colunas/campos: conta_id ou numero_conta, tipo (DEPOSITO/SAQUE), valor,
+data (opcional, ISO 8601) e descricao (opcional).
+
+Uso: python importar_transacoes.py arquivo.csv [banco.db] [--conta ID] [--lote N]
+"""
+
+import argparse
+import os
+import time
+from banco_db import BancoDados
+
+def importar_transacoes(caminho_arquivo, nome_db="banco.db", conta_id=None, tamanho_lote=1000):
+    """Executa a importação e imprime o relatório"""
+    if not os.path.exists(caminho_arquivo):
+        print(f"❌ Arquivo '{caminho_arquivo}' não encontrado!")
+        return
+
+    banco = BancoDados(nome_db)
+
+    print(f"📥 Importando '{caminho_arquivo}' para '{nome_db}'...")
+    inicio = time.perf_counter()
+    resumo = banco.importar_transacoes(caminho_arquivo, conta_id=conta_id, tamanho_lote=tamanho_lote)
+    duracao = time.perf_counter() - inicio
+
+    if resumo['retomada_de']:
+        print(f"   ↪️  Retomada a partir da linha {resumo['retomada_de'] + 1}")
+    for numero_linha, erro in resumo['erros']:
+        print(f"   ⚠️  Linha {numero_linha}: {erro}")
+    if resumo['rejeitadas'] > len(resumo['erros']):
+        print(f"   ⚠️  ... e mais {resumo['rejeitadas'] - len(resumo['erros'])} linhas rejeitadas")
+
+    print("\n📊 === RELATÓRIO ===")
+    print(f"✅ Importadas: {resumo['importadas']}")
+    print(f"❌ Rejeitadas: {resumo['rejeitadas']}")
+    if 'contas_atualizadas' in resumo:
+        print(f"💰 Saldos recalculados: {resumo['contas_atualizadas']} contas")
+    if resumo['importadas']:
+        print(f"⚡ Vazão: {resumo['importadas'] / duracao:,.0f} transações/s")
+    print(f"ℹ️  {resumo['mensagem']}")
+
+    banco.fechar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa transações de um arquivo CSV ou JSONL")
+    parser.add_argument("arquivo", help="arquivo .csv ou .jsonl")
+    parser.add_argument("banco", nargs="?", default="banco.db", help="banco de dados (padrão: banco.db)")
+    parser.add_argument("--conta", type=int, help="conta_id para arquivos sem coluna de conta")
+    parser.add_argument("--lote", type=int, default=1000, help="linhas por transação (padrão: 1000)")
+    argumentos = parser.parse_args()
+    importar_transacoes(argumentos.arquivo, argumentos.banco, argumentos.conta, argumentos.lote)
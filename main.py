@@ -1,6 +1,7 @@
-from banco_db import BancoDados
+from banco_db import BancoDados, SINAL_TIPO_TRANSACAO
 from datetime import datetime
 import getpass  # Para ocultar senha na digitação
+import itertools
 
 class ContaBancaria:
     def __init__(self, conta_data, banco_db):
@@ -13,31 +14,35 @@ class ContaBancaria:
     def atualizar_saldo_local(self):
         """Atualiza saldo local com dados do banco"""
         conta_data = self.banco_db.buscar_conta_por_id(self.conta_id)
-        if conta_data:
+        if conta_data and conta_data['saldo'] is not None:
             self.saldo = conta_data['saldo']
     
     
     def depositar(self, valor):
         if valor > 0:
-            self.saldo += valor
-            self.banco_db.atualizar_saldo(self.conta_id, self.saldo)
-            self.banco_db.registrar_transacao(
-                self.conta_id, "DEPOSITO", valor, f"Depósito de R$ {valor:.2f}"
-            )
+            novo_saldo, mensagem = self.banco_db.depositar(self.conta_id, valor)
+            if novo_saldo is None:
+                print(f"❌ {mensagem}")
+                return None
+            self.saldo = novo_saldo
             print(f"✅ Depósito realizado com sucesso! R$ {valor:.2f}")
+            return novo_saldo
         else:
             print("❌ Valor de depósito inválido! Tente novamente.")
+            return None
     
     def sacar(self, valor):
-        if valor > 0 and valor <= self.saldo:
-            self.saldo -= valor
-            self.banco_db.atualizar_saldo(self.conta_id, self.saldo)
-            self.banco_db.registrar_transacao(
-                self.conta_id, "SAQUE", valor, f"Saque de R$ {valor:.2f}"
-            )
+        if valor > 0:
+            novo_saldo, mensagem = self.banco_db.sacar(self.conta_id, valor)
+            if novo_saldo is None:
+                print(f"❌ {mensagem}")
+                return None
+            self.saldo = novo_saldo
             print(f"✅ Saque realizado com sucesso! R$ {valor:.2f}")
+            return novo_saldo
         else:
             print("❌ Valor inválido ou saldo insuficiente!")
+            return None
     
     def ver_saldo(self):
         # Atualizar saldo do banco
@@ -46,24 +51,30 @@ class ContaBancaria:
         print(f"💰 Conta: {numero_mascarado} | Titular: {self.titular} | Saldo: R$ {self.saldo:.2f}")
     
     def ver_historico(self):
-        transacoes = self.banco_db.obter_historico(self.conta_id)
+        # Histórico em fluxo: as primeiras linhas aparecem sem esperar o extrato inteiro
+        transacoes = self.banco_db.iterar_historico(self.conta_id)
+        primeira = next(transacoes, None)
         
-        if transacoes:
+        if primeira:
             print(f"\n📊 === Histórico de {self.titular} ===")
             print("-" * 60)
-            for transacao in transacoes:
+            for transacao in itertools.chain([primeira], transacoes):
                 tipo, valor, data, descricao = transacao
                 try:
                     data_formatada = datetime.fromisoformat(data.replace('Z', '+00:00')).strftime('%d/%m/%Y %H:%M')
                 except:
                     data_formatada = data[:16]  # Fallback se data não estiver no formato esperado
-                simbolo = "+" if tipo == "DEPOSITO" else "-"
+                simbolo = "+" if SINAL_TIPO_TRANSACAO.get(tipo, 0) > 0 else "-"
                 valor_float = float(valor) if valor else 0.0
                 print(f"{data_formatada} | {tipo} | {simbolo}R$ {valor_float:.2f} | {descricao}")
             print("-" * 60)
             print(f"💰 Saldo atual: R$ {self.saldo:.2f}")
         else:
             print("📝 Nenhuma transação realizada ainda.")
+    
+    def exportar_historico(self, caminho_arquivo):
+        total = self.banco_db.exportar_historico(self.conta_id, caminho_arquivo)
+        print(f"✅ {total} transações exportadas para '{caminho_arquivo}'")
 
 def obter_senha_segura(prompt="Digite sua senha: "):
     """Obtém senha de forma segura (oculta na digitação)"""
@@ -231,7 +242,8 @@ def menu_operacoes(conta):
         print("2 - Sacar")
         print("3 - Ver saldo")
         print("4 - Ver histórico")
-        print("5 - Logout")
+        print("5 - Exportar histórico (CSV)")
+        print("6 - Logout")
 
         try:
             opcao = int(input("Digite o número da opção desejada: "))
@@ -261,6 +273,10 @@ def menu_operacoes(conta):
                 conta.ver_historico()
             
             elif opcao == 5:
+                caminho = input("Nome do arquivo CSV (Enter para 'historico.csv'): ").strip() or "historico.csv"
+                conta.exportar_historico(caminho)
+            
+            elif opcao == 6:
                 print("🔐 Logout realizado com segurança!")
                 break
             
@@ -0,0 +1,195 @@
+"""
+Migrações versionadas do esquema do banco, controladas por PRAGMA user_version.
+
+Cada migração é aplicada uma única vez, em ordem, dentro da própria transação
+junto com a atualização do user_version. Para alterar o esquema, acrescente uma
+nova função ao final de MIGRACOES (nunca edite uma migração já publicada).
+"""
+
+def _migracao_tabelas_iniciais(banco, cursor):
+    """Tabelas contas, transacoes e auditoria (IF NOT EXISTS para bancos pré-migrações)"""
+    # Tabela de contas com segurança
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS contas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_conta TEXT UNIQUE NOT NULL,
+            titular_criptografado TEXT NOT NULL,
+            hash_senha TEXT NOT NULL,
+            salt_senha TEXT NOT NULL,
+            saldo_criptografado TEXT NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            tentativas_login INTEGER DEFAULT 0,
+            bloqueada BOOLEAN DEFAULT 0
+        )
+    ''')
+
+    # Tabela de transações
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conta_id INTEGER,
+            tipo TEXT NOT NULL,
+            valor_criptografado TEXT NOT NULL,
+            data_transacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            descricao_criptografada TEXT,
+            FOREIGN KEY (conta_id) REFERENCES contas (id)
+        )
+    ''')
+
+    # Tabela de auditoria de acessos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS auditoria (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_conta TEXT,
+            acao TEXT NOT NULL,
+            sucesso BOOLEAN NOT NULL,
+            ip_tentativa TEXT,
+            data_tentativa TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _migracao_indice_cego(banco, cursor):
+    """Coluna titular_indice (índice cego do titular), com preenchimento das contas existentes"""
+    banco.migrar_indice_cego(cursor)
+
+def _migracao_indices_consultas(banco, cursor):
+    """Índices das consultas mais frequentes (histórico, auditoria e listagem)"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transacoes_conta_data ON transacoes (conta_id, data_transacao)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_auditoria_conta_data ON auditoria (numero_conta, data_tentativa)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contas_data_criacao ON contas (data_criacao)")
+
+def _migracao_checkpoints_saldo(banco, cursor):
+    """Checkpoints de saldo: saldo do livro até uma transação, gravado a cada N transações"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS saldos_checkpoint (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conta_id INTEGER NOT NULL,
+            transacao_id INTEGER NOT NULL UNIQUE,
+            saldo_criptografado TEXT NOT NULL,
+            data_transacao TIMESTAMP NOT NULL,
+            data_checkpoint TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conta_id) REFERENCES contas (id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_checkpoint_conta_transacao ON saldos_checkpoint (conta_id, transacao_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_checkpoint_conta_data ON saldos_checkpoint (conta_id, data_transacao)")
+
+def _migracao_importacoes(banco, cursor):
+    """Controle de importações de transações: progresso confirmado e contas afetadas (para retomada)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS importacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            arquivo TEXT NOT NULL,
+            assinatura TEXT NOT NULL UNIQUE,
+            linhas_confirmadas INTEGER NOT NULL DEFAULT 0,
+            linhas_importadas INTEGER NOT NULL DEFAULT 0,
+            linhas_rejeitadas INTEGER NOT NULL DEFAULT 0,
+            concluida BOOLEAN NOT NULL DEFAULT 0,
+            data_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS importacoes_contas (
+            importacao_id INTEGER NOT NULL,
+            conta_id INTEGER NOT NULL,
+            PRIMARY KEY (importacao_id, conta_id),
+            FOREIGN KEY (importacao_id) REFERENCES importacoes (id)
+        )
+    """)
+
+def _migracao_versao_contas(banco, cursor):
+    """Coluna versao em contas: controle de concorrência otimista (compare-and-swap) do saldo"""
+    cursor.execute("PRAGMA table_info(contas)")
+    if 'versao' not in [coluna[1] for coluna in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE contas ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+
+def _migracao_arquivos_transacoes(banco, cursor):
+    """Registro dos arquivos mensais de transações antigas (faixa de datas e ids de cada mês)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS arquivos_transacoes (
+            mes TEXT PRIMARY KEY,
+            caminho TEXT NOT NULL,
+            data_inicio TIMESTAMP NOT NULL,
+            data_fim TIMESTAMP NOT NULL,
+            id_inicio INTEGER NOT NULL,
+            id_fim INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            data_arquivamento TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _migracao_rotacoes_chave(banco, cursor):
+    """Controle de rotações de chave: nova chave (só a impressão) e progresso por tabela/arquivo (para retomada)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rotacoes_chave (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            impressao_chave TEXT NOT NULL UNIQUE,
+            concluida BOOLEAN NOT NULL DEFAULT 0,
+            data_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rotacoes_chave_progresso (
+            rotacao_id INTEGER NOT NULL,
+            alvo TEXT NOT NULL,
+            ultimo_id INTEGER NOT NULL DEFAULT 0,
+            recriptografados INTEGER NOT NULL DEFAULT 0,
+            concluido BOOLEAN NOT NULL DEFAULT 0,
+            PRIMARY KEY (rotacao_id, alvo),
+            FOREIGN KEY (rotacao_id) REFERENCES rotacoes_chave (id)
+        )
+    """)
+
+def _migracao_data_minima_importacoes(banco, cursor):
+    """Coluna data_minima em importacoes_contas: transação importada mais antiga de cada conta"""
+    cursor.execute("PRAGMA table_info(importacoes_contas)")
+    if 'data_minima' not in [coluna[1] for coluna in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE importacoes_contas ADD COLUMN data_minima TIMESTAMP")
+
+def _migracao_indice_transacoes_conta_id(banco, cursor):
+    """Índice (conta_id, id): contagem e leitura da cauda desde o último checkpoint sem varrer a conta"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transacoes_conta_id ON transacoes (conta_id, id)")
+
+# A posição na lista é o número da versão (a primeira migração leva à versão 1)
+MIGRACOES = [
+    _migracao_tabelas_iniciais,
+    _migracao_indice_cego,
+    _migracao_indices_consultas,
+    _migracao_checkpoints_saldo,
+    _migracao_importacoes,
+    _migracao_versao_contas,
+    _migracao_arquivos_transacoes,
+    _migracao_rotacoes_chave,
+    _migracao_data_minima_importacoes,
+    _migracao_indice_transacoes_conta_id,
+]
+
+def versao_atual(conn):
+    """Versão do esquema gravada no banco"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def aplicar_migracoes(banco, conn):
+    """Aplica as migrações pendentes; no banco já atualizado é só uma leitura de PRAGMA"""
+    versao_alvo = len(MIGRACOES)
+    if versao_atual(conn) >= versao_alvo:
+        return 0
+
+    aplicadas = 0
+    cursor = conn.cursor()
+    for versao, migracao in enumerate(MIGRACOES, start=1):
+        try:
+            # Trava de escrita antes de reler a versão: outro processo pode ter migrado
+            cursor.execute("BEGIN IMMEDIATE")
+            if versao_atual(conn) >= versao:
+                conn.rollback()
+                continue
+            migracao(banco, cursor)
+            cursor.execute(f"PRAGMA user_version = {versao}")
+            conn.commit()
+            aplicadas += 1
+        except Exception:
+            conn.rollback()
+            raise
+    return aplicadas
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Script para migrar os dados criptografados do formato TEXT (base64 duplo)
+para BLOB binário, com relatório de tamanho e velocidade antes/depois
+"""
+
+import os
+import sys
+import time
+from banco_db import BancoDados
+
+AMOSTRA = 2000
+
+def medir_descriptografia(banco):
+    """Mede a vazão de descriptografia (valores/s) sobre uma amostra do banco"""
+    conn = banco.conectar()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT valor_criptografado FROM transacoes
+        UNION ALL
+        SELECT saldo_criptografado FROM contas
+        LIMIT ?
+    """, (AMOSTRA,))
+    valores = [linha[0] for linha in cursor.fetchall()]
+    conn.close()
+
+    if not valores:
+        return 0, 0.0
+
+    inicio = time.perf_counter()
+    for valor in valores:
+        banco.seguranca.descriptografar_dados(valor)
+    duracao = time.perf_counter() - inicio
+    return len(valores), len(valores) / duracao
+
+def migrar_formato_binario(nome_db="banco.db"):
+    """Executa a migração e imprime o relatório"""
+    if not os.path.exists(nome_db):
+        print(f"❌ Banco de dados '{nome_db}' não encontrado!")
+        return
+
+    banco = BancoDados(nome_db)
+
+    tamanho_antes = os.path.getsize(nome_db)
+    amostra_antes, vazao_antes = medir_descriptografia(banco)
+
+    print(f"🔄 Migrando '{nome_db}' para o formato binário...")
+    convertidos = banco.migrar_formato_binario()
+    for tabela, total in convertidos.items():
+        print(f"   ✅ {tabela}: {total} linhas convertidas")
+
+    # Devolver ao sistema de arquivos o espaço liberado
+    conn = banco.conectar()
+    conn.execute("VACUUM")
+    conn.close()
+
+    tamanho_depois = os.path.getsize(nome_db)
+    amostra_depois, vazao_depois = medir_descriptografia(banco)
+
+    print("\n📊 === RELATÓRIO ===")
+    print(f"💾 Tamanho do banco: {tamanho_antes/1024:.1f} KB → {tamanho_depois/1024:.1f} KB")
+    print(f"⚡ Descriptografia ({amostra_antes} valores): {vazao_antes:,.0f}/s → {vazao_depois:,.0f}/s")
+    print("✅ Migração concluída!")
+
+if __name__ == "__main__":
+    migrar_formato_binario(sys.argv[1] if len(sys.argv) > 1 else "banco.db")
@@ -0,0 +1,228 @@
+import functools
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import quote
+
+# Perfis de ajuste do SQLite aplicados a cada nova conexão. O perfil pode ser
+# escolhido por implantação com a variável de ambiente BANCO_PERFIL_SQLITE.
+PERFIS_SQLITE = {
+    # WAL com fsync completo a cada commit: leitores não bloqueiam escritores
+    "duravel": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    # WAL com synchronous=NORMAL: commits sem fsync (só no checkpoint), mais
+    # cache e mmap; uma queda de energia pode perder os últimos commits
+    "desempenho": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+PERFIL_PADRAO = "duravel"
+
+# Retentativa com espera exponencial quando o banco está ocupado (SQLITE_BUSY)
+TENTATIVAS_OCUPADO = 5
+ESPERA_INICIAL_OCUPADO = 0.05
+
+def obter_perfil(perfil=None):
+    """Resolve o perfil de PRAGMAs: nome, dicionário próprio ou o da variável de ambiente"""
+    if isinstance(perfil, dict):
+        return perfil
+    nome = perfil or os.environ.get("BANCO_PERFIL_SQLITE", PERFIL_PADRAO)
+    if nome not in PERFIS_SQLITE:
+        raise ValueError(f"Perfil SQLite desconhecido: {nome} (opções: {', '.join(PERFIS_SQLITE)})")
+    return PERFIS_SQLITE[nome]
+
+def aplicar_perfil(conn, perfil):
+    """Aplica os PRAGMAs do perfil à conexão (busy_timeout antes de journal_mode)"""
+    for pragma, valor in perfil.items():
+        conn.execute(f"PRAGMA {pragma} = {valor}").fetchall()
+
+def banco_ocupado(erro):
+    """Indica se o erro do SQLite é de banco ocupado/travado"""
+    if not isinstance(erro, sqlite3.OperationalError):
+        return False
+    codigo = getattr(erro, 'sqlite_errorcode', None)
+    if codigo is not None:
+        return codigo & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    mensagem = str(erro).lower()
+    return 'locked' in mensagem or 'busy' in mensagem
+
+def repetir_se_ocupado(funcao):
+    """Decorador: repete a operação com espera exponencial (e jitter) em SQLITE_BUSY"""
+    @functools.wraps(funcao)
+    def executar(*args, **kwargs):
+        espera = ESPERA_INICIAL_OCUPADO
+        for tentativa in range(TENTATIVAS_OCUPADO):
+            try:
+                return funcao(*args, **kwargs)
+            except sqlite3.OperationalError as erro:
+                if not banco_ocupado(erro) or tentativa == TENTATIVAS_OCUPADO - 1:
+                    raise
+                time.sleep(espera * (1 + random.random()))
+                espera *= 2
+    return executar
+
+def uri_memoria(nome="banco"):
+    """URI de um banco novo e isolado em memória, compartilhado pelas conexões deste processo
+
+    Usa o VFS memdb (SQLite 3.36+), que trava como um arquivo comum e respeita o
+    busy_timeout; em versões antigas cai para cache compartilhado (mode=memory).
+    """
+    nome = f"{os.path.basename(nome)}-{uuid.uuid4().hex}"
+    if sqlite3.sqlite_version_info >= (3, 36, 0):
+        return f"file:/{nome}?vfs=memdb"
+    return f"file:{nome}?mode=memory&cache=shared"
+
+def uri_somente_leitura(nome_db):
+    """URI mode=ro para um banco em disco (o arquivo precisa existir)"""
+    return f"file:{quote(os.path.abspath(nome_db))}?mode=ro"
+
+class ConexaoPool:
+    """Conexão emprestada do pool: close() devolve ao pool em vez de fechar"""
+
+    __slots__ = ('_conn', '_pool', '_devolvida')
+
+    def __init__(self, conn, pool):
+        self._conn = conn
+        self._pool = pool
+        self._devolvida = False
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def close(self):
+        """Devolve a conexão ao pool (pode ser chamado mais de uma vez)"""
+        if not self._devolvida:
+            self._devolvida = True
+            self._pool.devolver(self._conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, rastreamento):
+        if tipo_excecao is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+        self.close()
+        return False
+
+    def __del__(self):
+        # Garante a devolução se alguém esquecer o close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+class PoolConexoes:
+    """Pool limitado e thread-safe de conexões SQLite reutilizáveis"""
+
+    def __init__(self, nome_db, tamanho=5, timeout=30.0, intervalo_verificacao=30.0, perfil=None, uri=False,
+                 somente_leitura=False):
+        self.nome_db = nome_db
+        self.uri = uri
+        self.somente_leitura = somente_leitura
+        self.tamanho = tamanho
+        self.perfil = obter_perfil(perfil)
+        self.timeout = timeout
+        self.intervalo_verificacao = intervalo_verificacao
+
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._trava = threading.Lock()
+        self._ociosas = []  # (conexão, instante em que foi devolvida)
+        self._fechado = False
+
+    def _criar_conexao(self):
+        """Abre uma nova conexão, já com o perfil de PRAGMAs, utilizável por qualquer thread"""
+        conn = sqlite3.connect(self.nome_db, timeout=self.timeout, check_same_thread=False, uri=self.uri)
+        try:
+            if self.somente_leitura:
+                # journal_mode é do arquivo (definido pelas conexões de escrita); query_only barra escritas
+                aplicar_perfil(conn, {pragma: valor for pragma, valor in self.perfil.items() if pragma != "journal_mode"})
+                conn.execute("PRAGMA query_only = ON")
+            else:
+                aplicar_perfil(conn, self.perfil)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _conexao_saudavel(self, conn, devolvida_em):
+        """Verifica com SELECT 1 as conexões ociosas há mais tempo que o intervalo"""
+        if time.monotonic() - devolvida_em < self.intervalo_verificacao:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def obter(self):
+        """Empresta uma conexão, esperando até timeout se o pool estiver esgotado"""
+        if self._fechado:
+            # Após o encerramento, conexões avulsas (fechadas ao devolver)
+            return ConexaoPool(self._criar_conexao(), self)
+
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError(f"Pool de conexões esgotado ({self.tamanho} em uso)")
+
+        try:
+            while True:
+                with self._trava:
+                    item = self._ociosas.pop() if self._ociosas else None
+                if item is None:
+                    return ConexaoPool(self._criar_conexao(), self)
+                conn, devolvida_em = item
+                if self._conexao_saudavel(conn, devolvida_em):
+                    return ConexaoPool(conn, self)
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+        except Exception:
+            self._vagas.release()
+            raise
+
+    def devolver(self, conn):
+        """Recebe uma conexão de volta, desfazendo transações deixadas abertas"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            reutilizavel = True
+        except sqlite3.Error:
+            reutilizavel = False
+
+        with self._trava:
+            if self._fechado or not reutilizavel:
+                conn.close()
+            else:
+                self._ociosas.append((conn, time.monotonic()))
+
+        try:
+            self._vagas.release()
+        except ValueError:
+            pass  # Conexão avulsa emprestada após o encerramento
+
+    def fechar(self):
+        """Fecha as conexões ociosas; as emprestadas são fechadas ao serem devolvidas"""
+        with self._trava:
+            self._fechado = True
+            ociosas, self._ociosas = self._ociosas, []
+        for conn, _ in ociosas:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Script para rotacionar a chave de criptografia (sistema.key) e recifrar os
+dados com a nova chave. O sistema continua legível durante a rotação: as
+chaves antigas continuam no chaveiro (e, salvo com --remover-chave-antiga,
+depois dela também). Se for interrompido, basta executar de novo: a rotação
+continua do último lote confirmado.
+
+Uso: python rotacionar_chave.py [banco.db] [--lote N] [--cifra fernet|aes-gcm] [--remover-chave-antiga]
+"""
+
+import argparse
+import os
+import time
+from banco_db import BancoDados
+from seguranca import SUITES_CIFRA
+
+def rotacionar_chave(nome_db="banco.db", tamanho_lote=500, cifra=None, remover_chave_antiga=False):
+    """Executa a rotação e imprime o relatório"""
+    if not os.path.exists(nome_db):
+        print(f"❌ Banco de dados '{nome_db}' não encontrado!")
+        return
+
+    banco = BancoDados(nome_db, cifra=cifra)
+
+    print(f"🔑 Rotacionando a chave de '{nome_db}'...")
+    inicio = time.perf_counter()
+    resumo = banco.rotacionar_chave(tamanho_lote=tamanho_lote, remover_chave_antiga=remover_chave_antiga)
+    duracao = time.perf_counter() - inicio
+
+    if resumo['retomada']:
+        print("   ↪️  Retomada a partir do último lote confirmado")
+    for alvo, total in resumo['recriptografados'].items():
+        print(f"   ✅ {alvo}: {total} linhas recifradas")
+
+    total = sum(resumo['recriptografados'].values())
+    print("\n📊 === RELATÓRIO ===")
+    print(f"🆔 Nova chave: {resumo['impressao_chave']}")
+    print(f"🔐 Linhas recifradas: {total}")
+    if total:
+        print(f"⚡ Vazão: {total / duracao:,.0f} linhas/s")
+    if resumo['chaves_removidas']:
+        print(f"🗑️  Chaves antigas removidas: {resumo['chaves_removidas']} (cópias de segurança antigas deixam de ser legíveis)")
+    elif not remover_chave_antiga:
+        print("ℹ️  Chaves antigas mantidas no chaveiro (--remover-chave-antiga para retirá-las)")
+    print(f"ℹ️  {resumo['mensagem']}")
+
+    banco.fechar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rotaciona a chave de criptografia e recifra os dados")
+    parser.add_argument("banco", nargs="?", default="banco.db", help="banco de dados (padrão: banco.db)")
+    parser.add_argument("--lote", type=int, default=500, help="linhas por transação (padrão: 500)")
+    parser.add_argument("--cifra", choices=list(SUITES_CIFRA), help="suíte dos valores recifrados (padrão: BANCO_CIFRA ou fernet)")
+    parser.add_argument("--remover-chave-antiga", action="store_true",
+                        help="remove as chaves antigas no final (bancos, snapshots e cópias cifrados com elas ficam ilegíveis)")
+    argumentos = parser.parse_args()
+    rotacionar_chave(argumentos.banco, argumentos.lote, argumentos.cifra, argumentos.remover_chave_antiga)
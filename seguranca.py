@@ -1,15 +1,383 @@
+import atexit
 import hashlib
+import hmac
+import multiprocessing
 import secrets
 import os
-from cryptography.fernet import Fernet
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 import base64
+from auditoria import obter_gravador
+
+# Formatos de armazenamento dos valores criptografados:
+# - TEXT (legado): base64 do token Fernet, que já é base64 (codificação dupla)
+# - BLOB versionado: 1 byte de versão + dados da suíte de cifra daquela versão
+#   1 = token Fernet em binário puro (AES-128-CBC + HMAC-SHA256)
+#   2 = AES-256-GCM: nonce (12 bytes) + texto cifrado + tag (16 bytes)
+VERSAO_FERNET_BINARIO = 1
+VERSAO_AES_GCM = 2
+
+def _token_para_binario(token):
+    """Converte um token Fernet (base64 urlsafe) para o formato BLOB versionado"""
+    return bytes([VERSAO_FERNET_BINARIO]) + base64.urlsafe_b64decode(token)
+
+def converter_para_binario(dados_criptografados):
+    """Converte um valor TEXT legado para BLOB sem descriptografar; None se não for legado"""
+    if not isinstance(dados_criptografados, str):
+        return None
+    try:
+        return _token_para_binario(base64.b64decode(dados_criptografados.encode('utf-8'), validate=True))
+    except Exception:
+        return None
+
+class _SuiteFernet:
+    """Fernet (ou MultiFernet com várias chaves): formato original, sempre legível"""
+    
+    versao = VERSAO_FERNET_BINARIO
+    
+    def __init__(self, chaves):
+        fernets = [Fernet(chave) for chave in chaves]
+        self.fernet = fernets[0] if len(fernets) == 1 else MultiFernet(fernets)
+    
+    def cifrar(self, dados_bytes):
+        return base64.urlsafe_b64decode(self.fernet.encrypt(dados_bytes))
+    
+    def decifrar(self, corpo):
+        return self.fernet.decrypt(base64.urlsafe_b64encode(corpo))
+
+class _SuiteAesGcm:
+    """AES-256-GCM (AEAD): sem base64 nem HMAC separado, bem mais barato por campo pequeno"""
+    
+    versao = VERSAO_AES_GCM
+    TAMANHO_NONCE = 12
+    
+    def __init__(self, chaves):
+        # Uma chave AES derivada (HKDF) de cada chave do chaveiro, a principal primeiro
+        self.aeads = [AESGCM(self._derivar_chave(chave)) for chave in chaves]
+        self._dados_associados = bytes([self.versao])
+    
+    @staticmethod
+    def _derivar_chave(chave):
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"banco-campos-aes-gcm-v1")
+        return hkdf.derive(base64.urlsafe_b64decode(chave))
+    
+    def cifrar(self, dados_bytes):
+        nonce = os.urandom(self.TAMANHO_NONCE)
+        return nonce + self.aeads[0].encrypt(nonce, dados_bytes, self._dados_associados)
+    
+    def decifrar(self, corpo):
+        nonce, cifrado = corpo[:self.TAMANHO_NONCE], corpo[self.TAMANHO_NONCE:]
+        for aead in self.aeads:
+            try:
+                return aead.decrypt(nonce, cifrado, self._dados_associados)
+            except InvalidTag:
+                continue
+        raise InvalidTag()
+
+# Suítes disponíveis para novos valores; a leitura aceita qualquer versão registrada
+SUITES_CIFRA = {
+    "fernet": _SuiteFernet,
+    "aes-gcm": _SuiteAesGcm,
+}
+CIFRA_PADRAO = "fernet"
+
+class CifraCampos:
+    """Cifra dos campos montada a partir do chaveiro: cifra com a suíte escolhida, decifra pelo byte de versão"""
+    
+    def __init__(self, chaves):
+        self.suites = {nome: classe(chaves) for nome, classe in SUITES_CIFRA.items()}
+        self._por_versao = {suite.versao: suite for suite in self.suites.values()}
+        self.fernet = self.suites["fernet"].fernet  # Valores TEXT legados
+    
+    def criptografar(self, dados_bytes, suite=CIFRA_PADRAO):
+        """Cifra e retorna o BLOB versionado"""
+        escolhida = self.suites[suite]
+        return bytes([escolhida.versao]) + escolhida.cifrar(dados_bytes)
+    
+    def descriptografar(self, dados):
+        """Decifra um BLOB versionado com a suíte indicada no primeiro byte"""
+        suite = self._por_versao.get(dados[0])
+        if suite is None:
+            raise ValueError(f"Versão de formato desconhecida: {dados[0]}")
+        return suite.decifrar(dados[1:])
+
+def _montar_cifra(chaves):
+    """Cria a cifra dos campos a partir das chaves do chaveiro"""
+    return CifraCampos(chaves)
+
+def _descriptografar_valor(cifra, dados_criptografados):
+    """Descriptografa um valor armazenado (BLOB ou TEXT legado); retorna o original se falhar"""
+    if dados_criptografados is None:
+        return None
+    try:
+        if isinstance(dados_criptografados, str):
+            return cifra.fernet.decrypt(base64.b64decode(dados_criptografados.encode('utf-8'))).decode('utf-8')
+        return cifra.descriptografar(bytes(dados_criptografados)).decode('utf-8')
+    except Exception:
+        return dados_criptografados
+
+def _descriptografar_bloco(chaves, bloco):
+    """Descriptografa um bloco de valores (executado nos workers do pool)"""
+    cifra = _montar_cifra(chaves)
+    return [_descriptografar_valor(cifra, valor) for valor in bloco]
+
+def _recriptografar_bloco(chaves, suite, bloco):
+    """Recifra com a chave principal os valores do bloco (executado nos workers do pool)
+    
+    Cada item vira None (já está na chave principal, ou é ilegível com o chaveiro) ou
+    (novo_valor, texto_claro).
+    """
+    cifra = _montar_cifra(chaves)
+    principal = _montar_cifra(chaves[:1])
+    resultados = []
+    for valor in bloco:
+        if valor is None:
+            resultados.append(None)
+            continue
+        try:
+            if isinstance(valor, str):
+                texto = cifra.fernet.decrypt(base64.b64decode(valor.encode('utf-8')))
+            else:
+                dados = bytes(valor)
+                try:
+                    principal.descriptografar(dados)
+                    resultados.append(None)
+                    continue
+                except Exception:
+                    texto = cifra.descriptografar(dados)
+        except Exception:
+            resultados.append(None)
+            continue
+        resultados.append((cifra.criptografar(texto, suite), texto.decode('utf-8')))
+    return resultados
+
+# Formato do hash de senha: algoritmo$iteracoes$salt$hash. Registros legados (sem prefixo) são
+# SHA-256 hex de senha+salt, com o salt na coluna salt_senha, e são refeitos no próximo login
+ALGORITMO_HASH_SENHA = "pbkdf2_sha256"
+ITERACOES_SENHA_PADRAO = 600_000
+
+def derivar_senha(senha, salt, iteracoes):
+    """PBKDF2-HMAC-SHA256 da senha (executado no pool de processos de hash)"""
+    return hashlib.pbkdf2_hmac('sha256', senha.encode('utf-8'), salt.encode('utf-8'), iteracoes).hex()
+
+def _hash_senha_legado(senha, salt):
+    """Hash do formato antigo: uma passada de SHA-256 sobre senha + salt"""
+    return hashlib.sha256(f"{senha}{salt}".encode('utf-8')).hexdigest()
+
+class GerenciadorChaves:
+    """Carrega o chaveiro de criptografia uma vez por processo e reaproveita a cifra"""
+    
+    _instancias = {}
+    _trava_instancias = threading.Lock()
+    
+    def __init__(self, chave_arquivo, intervalo_verificacao=1.0):
+        self.chave_arquivo = chave_arquivo
+        self.intervalo_verificacao = intervalo_verificacao
+        self._trava = threading.Lock()
+        self._assinatura = None
+        self._ultima_verificacao = 0.0
+        self._chaves = []
+        self._cifra = None
+    
+    @classmethod
+    def obter(cls, chave_arquivo):
+        """Retorna o gerenciador compartilhado do arquivo de chave informado"""
+        caminho = os.path.abspath(chave_arquivo)
+        with cls._trava_instancias:
+            gerenciador = cls._instancias.get(caminho)
+            if gerenciador is None:
+                gerenciador = cls(caminho)
+                cls._instancias[caminho] = gerenciador
+            return gerenciador
+    
+    def _assinatura_arquivo(self):
+        """Identifica a versão do arquivo de chave sem lê-lo"""
+        info = os.stat(self.chave_arquivo)
+        return (info.st_mtime_ns, info.st_size, info.st_ino)
+    
+    def _carregar(self, assinatura):
+        """Lê o chaveiro do disco: uma chave por linha, a primeira é a principal"""
+        with open(self.chave_arquivo, 'rb') as arquivo:
+            linhas = arquivo.read().splitlines()
+        
+        chaves = [linha.strip() for linha in linhas if linha.strip() and not linha.startswith(b'#')]
+        if not chaves:
+            raise ValueError(f"Arquivo de chave vazio: {self.chave_arquivo}")
+        
+        self._chaves = chaves
+        self._cifra = _montar_cifra(chaves)
+        self._assinatura = assinatura
+    
+    def _atualizar_se_necessario(self):
+        """Recarrega o chaveiro apenas se o arquivo mudou desde a última leitura"""
+        agora = time.monotonic()
+        if self._cifra is not None and agora - self._ultima_verificacao < self.intervalo_verificacao:
+            return
+        
+        with self._trava:
+            if self._cifra is not None and agora - self._ultima_verificacao < self.intervalo_verificacao:
+                return
+            assinatura = self._assinatura_arquivo()
+            if assinatura != self._assinatura:
+                self._carregar(assinatura)
+            self._ultima_verificacao = agora
+    
+    def obter_cifra(self):
+        """Retorna a cifra dos campos (CifraCampos) em cache"""
+        self._atualizar_se_necessario()
+        return self._cifra
+    
+    def obter_chaves(self):
+        """Retorna as chaves do chaveiro, a principal primeiro"""
+        self._atualizar_se_necessario()
+        return list(self._chaves)
+    
+    def invalidar(self):
+        """Força a releitura do arquivo de chave no próximo uso"""
+        with self._trava:
+            self._assinatura = None
+            self._cifra = None
+            self._ultima_verificacao = 0.0
+
+class CacheDescriptografia:
+    """Cache LRU de valores já descriptografados, indexado pelo resumo do valor cifrado
+    
+    Mantém texto claro em memória: só é usado quando habilitado explicitamente
+    (Seguranca(cache_descriptografia=True) ou uma instância desta classe).
+    """
+    
+    def __init__(self, max_itens=10000, max_bytes=16 * 1024 * 1024, ttl=300.0):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._itens = OrderedDict()  # resumo -> (valor, expira_em, tamanho)
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.expiracoes = 0
+        self.remocoes = 0
+    
+    def _resumo(self, dados_criptografados):
+        """Resumo do valor cifrado (a chave do cache nunca guarda o próprio valor)"""
+        if isinstance(dados_criptografados, str):
+            dados_criptografados = dados_criptografados.encode('utf-8')
+        return hashlib.blake2b(dados_criptografados, digest_size=16).digest()
+    
+    def obter(self, dados_criptografados):
+        """Retorna (True, valor) se estiver em cache e válido; senão (False, None)"""
+        resumo = self._resumo(dados_criptografados)
+        with self._trava:
+            item = self._itens.get(resumo)
+            if item is None:
+                self.faltas += 1
+                return False, None
+            valor, expira_em, tamanho = item
+            if time.monotonic() >= expira_em:
+                del self._itens[resumo]
+                self._bytes -= tamanho
+                self.expiracoes += 1
+                self.faltas += 1
+                return False, None
+            self._itens.move_to_end(resumo)
+            self.acertos += 1
+            return True, valor
+    
+    def guardar(self, dados_criptografados, valor):
+        """Guarda o valor descriptografado, removendo os menos usados acima dos limites"""
+        resumo = self._resumo(dados_criptografados)
+        tamanho = sys.getsizeof(valor) + sys.getsizeof(resumo)
+        if tamanho > self.max_bytes:
+            return
+        with self._trava:
+            anterior = self._itens.pop(resumo, None)
+            if anterior is not None:
+                self._bytes -= anterior[2]
+            self._itens[resumo] = (valor, time.monotonic() + self.ttl, tamanho)
+            self._bytes += tamanho
+            while len(self._itens) > self.max_itens or self._bytes > self.max_bytes:
+                _, (_, _, tamanho_removido) = self._itens.popitem(last=False)
+                self._bytes -= tamanho_removido
+                self.remocoes += 1
+    
+    def invalidar(self, dados_criptografados=None):
+        """Remove um valor do cache, ou tudo se nenhum for informado"""
+        with self._trava:
+            if dados_criptografados is None:
+                self._itens.clear()
+                self._bytes = 0
+                return
+            item = self._itens.pop(self._resumo(dados_criptografados), None)
+            if item is not None:
+                self._bytes -= item[2]
+    
+    def estatisticas(self):
+        """Contadores de acerto/falta e ocupação atual"""
+        with self._trava:
+            consultas = self.acertos + self.faltas
+            return {
+                'itens': len(self._itens),
+                'bytes': self._bytes,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'taxa_acerto': round(self.acertos / consultas, 4) if consultas else 0.0,
+                'expiracoes': self.expiracoes,
+                'remocoes': self.remocoes,
+            }
 
 class Seguranca:
     """Classe responsável pela segurança do sistema bancário"""
     
-    def __init__(self):
-        self.chave_arquivo = "sistema.key"
+    # Descriptografia em lote: abaixo do limite roda em linha, acima vai para o pool
+    LIMITE_LOTE_SEQUENCIAL = 64
+    TAMANHO_BLOCO_LOTE = 256
+    
+    # Hash de senha: no máximo ESPERA_POR_PROCESSO_HASH pedidos por processo na fila; além disso o pedido
+    # espera até ESPERA_MAXIMA_HASH segundos por uma vaga e então falha
+    ESPERA_POR_PROCESSO_HASH = 4
+    ESPERA_MAXIMA_HASH = 10.0
+    
+    _pools = {}
+    _pools_hash = {}
+    _trava_pools = threading.Lock()
+    
+    def __init__(self, chave_arquivo="sistema.key", usar_processos=False, max_workers=None, arquivo_log="logs_seguranca.txt",
+                 cache_descriptografia=None, cifra=None, iteracoes_senha=None, processos_hash=None):
+        self.chave_arquivo = chave_arquivo
+        self.arquivo_log = arquivo_log
+        self.usar_processos = usar_processos
+        self.max_workers = max_workers or os.cpu_count() or 1
+        
+        # Custo do PBKDF2 (calibrado por implantação com calibrar_hash_senha.py, via BANCO_PBKDF2_ITERACOES)
+        # e processos do pool de hash (0 = calcula na própria thread)
+        self.iteracoes_senha = iteracoes_senha or int(os.environ.get("BANCO_PBKDF2_ITERACOES", ITERACOES_SENHA_PADRAO))
+        self.processos_hash = (os.cpu_count() or 1) if processos_hash is None else processos_hash
+        
+        # Suíte usada nos novos valores ("fernet" ou "aes-gcm"); padrão pela variável de ambiente BANCO_CIFRA.
+        # Valores já gravados continuam legíveis com qualquer suíte escolhida
+        self.suite_cifra = cifra or os.environ.get("BANCO_CIFRA", CIFRA_PADRAO)
+        if self.suite_cifra not in SUITES_CIFRA:
+            raise ValueError(f"Cifra desconhecida: {self.suite_cifra} (opções: {', '.join(SUITES_CIFRA)})")
+        
+        # Cache opcional de valores descriptografados: True (limites padrão) ou uma CacheDescriptografia
+        if cache_descriptografia is True:
+            cache_descriptografia = CacheDescriptografia()
+        self.cache = cache_descriptografia or None
+        self._cifra_do_cache = None
+        
         self.garantir_chave_existe()
+        self.chaves = GerenciadorChaves.obter(self.chave_arquivo)
     
     def garantir_chave_existe(self):
         """Garante que existe uma chave de criptografia"""
@@ -21,26 +389,56 @@ class Seguranca:
         chave = Fernet.generate_key()
         with open(self.chave_arquivo, 'wb') as arquivo:
             arquivo.write(chave)
+        GerenciadorChaves.obter(self.chave_arquivo).invalidar()
+        if self.cache is not None:
+            self.cache.invalidar()
+        return chave
+    
+    def impressao_chave(self, chave):
+        """Identificador curto e não reversível de uma chave (para registros e relatórios)"""
+        return hashlib.sha256(chave).hexdigest()[:16]
+    
+    def gravar_chaveiro(self, chaves):
+        """Grava o chaveiro (a principal primeiro) de forma atômica e descarta cifra e cache em memória"""
+        temporario = f"{self.chave_arquivo}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(b"\n".join(chaves) + b"\n")
+        if os.path.exists(self.chave_arquivo):
+            shutil.copymode(self.chave_arquivo, temporario)
+        os.replace(temporario, self.chave_arquivo)
+        GerenciadorChaves.obter(self.chave_arquivo).invalidar()
+        if self.cache is not None:
+            self.cache.invalidar()
+    
+    def adicionar_chave_principal(self, chave=None):
+        """Coloca uma nova chave (gerada se não informada) à frente do chaveiro; as antigas seguem decifrando"""
+        chave = chave or Fernet.generate_key()
+        self.gravar_chaveiro([chave] + self.chaves.obter_chaves())
         return chave
     
     def obter_chave_criptografia(self):
-        """Obtém a chave de criptografia existente"""
+        """Obtém a chave de criptografia principal (em cache)"""
         try:
-            with open(self.chave_arquivo, 'rb') as arquivo:
-                return arquivo.read()
+            return self.chaves.obter_chaves()[0]
         except FileNotFoundError:
             return self.gerar_chave_criptografia()
     
+    def obter_cifra(self):
+        """Obtém a cifra em cache, gerando a chave se o arquivo sumir"""
+        try:
+            return self.chaves.obter_cifra()
+        except FileNotFoundError:
+            self.gerar_chave_criptografia()
+            return self.chaves.obter_cifra()
+    
     def criptografar_dados(self, dados):
-        """Criptografa dados sensíveis"""
+        """Criptografa dados sensíveis (retorna BLOB versionado)"""
         if dados is None:
             return None
         
-        chave = self.obter_chave_criptografia()
-        fernet = Fernet(chave)
+        cifra = self.obter_cifra()
         dados_bytes = str(dados).encode('utf-8')
-        dados_criptografados = fernet.encrypt(dados_bytes)
-        return base64.b64encode(dados_criptografados).decode('utf-8')
+        return cifra.criptografar(dados_bytes, self.suite_cifra)
     
     def descriptografar_dados(self, dados_criptografados):
         """Descriptografa dados sensíveis"""
@@ -48,35 +446,216 @@ class Seguranca:
             return None
         
         try:
-            chave = self.obter_chave_criptografia()
-            fernet = Fernet(chave)
-            dados_base64 = base64.b64decode(dados_criptografados.encode('utf-8'))
-            dados_descriptografados = fernet.decrypt(dados_base64)
-            return dados_descriptografados.decode('utf-8')
+            cifra = self.obter_cifra()
         except Exception:
             return dados_criptografados  # Retorna original se falhar
+        
+        if self.cache is None:
+            return _descriptografar_valor(cifra, dados_criptografados)
+        
+        self._verificar_cifra_do_cache(cifra)
+        encontrado, valor = self.cache.obter(dados_criptografados)
+        if not encontrado:
+            valor = _descriptografar_valor(cifra, dados_criptografados)
+            if valor != dados_criptografados:  # Falhas não entram no cache
+                self.cache.guardar(dados_criptografados, valor)
+        return valor
+    
+    def _verificar_cifra_do_cache(self, cifra):
+        """Esvazia o cache se o chaveiro foi recarregado (a mesma cifra não decifraria igual)"""
+        if cifra is not self._cifra_do_cache:
+            if self._cifra_do_cache is not None:
+                self.cache.invalidar()
+            self._cifra_do_cache = cifra
+    
+    def _obter_pool(self):
+        """Retorna o pool de workers compartilhado no processo para esta configuração"""
+        chave_pool = (self.usar_processos, self.max_workers)
+        with Seguranca._trava_pools:
+            pool = Seguranca._pools.get(chave_pool)
+            if pool is None:
+                classe_pool = ProcessPoolExecutor if self.usar_processos else ThreadPoolExecutor
+                pool = classe_pool(max_workers=self.max_workers)
+                Seguranca._pools[chave_pool] = pool
+            return pool
+    
+    def descriptografar_lote(self, lista, tamanho_bloco=None):
+        """Descriptografa uma lista de valores em blocos paralelos, preservando a ordem"""
+        valores = list(lista)
+        if self.cache is None:
+            return self._descriptografar_lote_sem_cache(valores, tamanho_bloco)
+        
+        # Com cache: só os valores ausentes vão para a descriptografia
+        try:
+            self._verificar_cifra_do_cache(self.obter_cifra())
+        except Exception:
+            return self._descriptografar_lote_sem_cache(valores, tamanho_bloco)
+        resultados = [None] * len(valores)
+        ausentes = []
+        for indice, valor in enumerate(valores):
+            if valor is None:
+                continue
+            encontrado, decifrado = self.cache.obter(valor)
+            if encontrado:
+                resultados[indice] = decifrado
+            else:
+                ausentes.append(indice)
+        
+        decifrados = self._descriptografar_lote_sem_cache([valores[indice] for indice in ausentes], tamanho_bloco)
+        for indice, decifrado in zip(ausentes, decifrados):
+            resultados[indice] = decifrado
+            if decifrado != valores[indice]:
+                self.cache.guardar(valores[indice], decifrado)
+        return resultados
+    
+    def _descriptografar_lote_sem_cache(self, valores, tamanho_bloco=None):
+        """Descriptografa a lista em linha (lotes pequenos) ou em blocos no pool de workers"""
+        tamanho_bloco = tamanho_bloco or self.TAMANHO_BLOCO_LOTE
+        
+        # Caminho rápido: lotes pequenos não compensam o custo do pool
+        if len(valores) <= self.LIMITE_LOTE_SEQUENCIAL or self.max_workers <= 1:
+            return self._descriptografar_em_linha(valores)
+        
+        try:
+            chaves = self.chaves.obter_chaves()
+        except FileNotFoundError:
+            return self._descriptografar_em_linha(valores)
+        
+        blocos = [valores[i:i + tamanho_bloco] for i in range(0, len(valores), tamanho_bloco)]
+        pool = self._obter_pool()
+        resultados = []
+        for bloco_descriptografado in pool.map(_descriptografar_bloco, [chaves] * len(blocos), blocos):
+            resultados.extend(bloco_descriptografado)
+        return resultados
+    
+    def recriptografar_lote(self, lista, tamanho_bloco=None):
+        """Recifra com a chave principal (e a suíte configurada) os valores que ainda usam outra chave
+        
+        Retorna, na ordem, None para o que não muda e (novo_valor, texto_claro) para o que foi recifrado.
+        """
+        valores = list(lista)
+        tamanho_bloco = tamanho_bloco or self.TAMANHO_BLOCO_LOTE
+        chaves = self.chaves.obter_chaves()
+        
+        if len(valores) <= self.LIMITE_LOTE_SEQUENCIAL or self.max_workers <= 1:
+            return _recriptografar_bloco(chaves, self.suite_cifra, valores)
+        
+        blocos = [valores[i:i + tamanho_bloco] for i in range(0, len(valores), tamanho_bloco)]
+        pool = self._obter_pool()
+        resultados = []
+        for bloco in pool.map(_recriptografar_bloco, [chaves] * len(blocos), [self.suite_cifra] * len(blocos), blocos):
+            resultados.extend(bloco)
+        return resultados
+    
+    def _descriptografar_em_linha(self, valores):
+        """Descriptografa na thread atual, sem passar pelo cache"""
+        try:
+            cifra = self.obter_cifra()
+        except Exception:
+            return list(valores)  # Retorna os originais se falhar
+        return [_descriptografar_valor(cifra, valor) for valor in valores]
+    
+    def normalizar_titular(self, titular):
+        """Normaliza o nome do titular para comparação (minúsculas, sem espaços nas pontas)"""
+        return str(titular).lower().strip()
+    
+    def _chave_indice_cego(self, chave):
+        """Deriva da chave de criptografia uma chave própria para o índice cego"""
+        return hmac.new(chave, b"banco-indice-cego-v1", hashlib.sha256).digest()
+    
+    def calcular_indice_cego(self, titular, chave=None):
+        """Calcula o índice cego (HMAC-SHA256) do titular normalizado"""
+        if chave is None:
+            chave = self.obter_chave_criptografia()
+        titular_normalizado = self.normalizar_titular(titular).encode('utf-8')
+        return hmac.new(self._chave_indice_cego(chave), titular_normalizado, hashlib.sha256).hexdigest()
+    
+    def calcular_indices_cegos(self, titular):
+        """Calcula o índice cego do titular com cada chave do chaveiro"""
+        try:
+            chaves = self.chaves.obter_chaves()
+        except FileNotFoundError:
+            chaves = [self.obter_chave_criptografia()]
+        return [self.calcular_indice_cego(titular, chave) for chave in chaves]
     
     def gerar_salt(self):
         """Gera um salt aleatório para hash de senha"""
         return secrets.token_hex(32)
     
+    def _obter_pool_hash(self):
+        """Pool de processos de hash compartilhado no processo e o semáforo que limita a fila dele
+        
+        Os workers (forkserver/spawn) importam de novo o script principal como __mp_main__: scripts
+        que criam contas ou autenticam devem deixar o código de execução sob if __name__ == "__main__"
+        e não abrir o banco na importação (api_banco.py cria o BancoDados só no primeiro uso).
+        """
+        with Seguranca._trava_pools:
+            pool_hash = Seguranca._pools_hash.get(self.processos_hash)
+            if pool_hash is None:
+                # Workers por forkserver/spawn: o pool nasce sob demanda num processo que já tem threads
+                # (auditoria, commit em grupo, Flask), e fork() nesse estado pode travar o filho
+                metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                pool_hash = (ProcessPoolExecutor(max_workers=self.processos_hash,
+                                                 mp_context=multiprocessing.get_context(metodo)),
+                             threading.BoundedSemaphore(self.processos_hash * self.ESPERA_POR_PROCESSO_HASH))
+                Seguranca._pools_hash[self.processos_hash] = pool_hash
+            return pool_hash
+    
+    def _derivar_senha(self, senha, salt, iteracoes):
+        """Executa o PBKDF2 no pool de processos, fora da thread da requisição e do GIL"""
+        if self.processos_hash <= 0:
+            return derivar_senha(senha, salt, iteracoes)
+        
+        pool_hash = self._obter_pool_hash()
+        pool, vagas = pool_hash
+        if not vagas.acquire(timeout=self.ESPERA_MAXIMA_HASH):
+            raise RuntimeError("Serviço de hash de senhas sobrecarregado, tente novamente")
+        try:
+            return pool.submit(derivar_senha, senha, salt, iteracoes).result()
+        except BrokenProcessPool:
+            # Um worker morreu (ou não conseguiu iniciar): descarta o pool, o próximo pedido cria outro
+            with Seguranca._trava_pools:
+                if Seguranca._pools_hash.get(self.processos_hash) is pool_hash:
+                    del Seguranca._pools_hash[self.processos_hash]
+            return derivar_senha(senha, salt, iteracoes)
+        finally:
+            vagas.release()
+    
+    @classmethod
+    def encerrar_pools(cls):
+        """Encerra os pools de workers do processo (no atexit; um novo uso cria outros sob demanda)"""
+        with cls._trava_pools:
+            pools = list(cls._pools.values()) + [pool for pool, _ in cls._pools_hash.values()]
+            cls._pools.clear()
+            cls._pools_hash.clear()
+        for pool in pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
     def hash_senha(self, senha, salt=None):
-        """Cria hash seguro da senha com salt"""
+        """Cria hash seguro da senha com salt (PBKDF2-HMAC-SHA256 no formato versionado)"""
         if salt is None:
             salt = self.gerar_salt()
         
-        # Combina senha + salt e faz hash com SHA-256
-        senha_salt = f"{senha}{salt}".encode('utf-8')
-        hash_obj = hashlib.sha256()
-        hash_obj.update(senha_salt)
-        hash_senha = hash_obj.hexdigest()
-        
-        return hash_senha, salt
+        derivado = self._derivar_senha(senha, salt, self.iteracoes_senha)
+        return f"{ALGORITMO_HASH_SENHA}${self.iteracoes_senha}${salt}${derivado}", salt
     
     def verificar_senha(self, senha, hash_armazenado, salt_armazenado):
-        """Verifica se a senha está correta"""
-        hash_tentativa, _ = self.hash_senha(senha, salt_armazenado)
-        return hash_tentativa == hash_armazenado
+        """Verifica se a senha está correta (formato versionado ou SHA-256 legado)"""
+        partes = hash_armazenado.split("$")
+        if len(partes) == 4 and partes[0] == ALGORITMO_HASH_SENHA:
+            _, iteracoes, salt, esperado = partes
+            tentativa = self._derivar_senha(senha, salt, int(iteracoes))
+        else:
+            esperado = hash_armazenado
+            tentativa = _hash_senha_legado(senha, salt_armazenado)
+        return hmac.compare_digest(tentativa, esperado)
+    
+    def precisa_rehash(self, hash_armazenado):
+        """Indica se o hash é legado ou mais barato que o custo configurado (refazer no login)"""
+        partes = hash_armazenado.split("$")
+        if len(partes) != 4 or partes[0] != ALGORITMO_HASH_SENHA:
+            return True
+        return int(partes[1]) < self.iteracoes_senha
     
     def mascarar_dados_sensveis(self, dados, tipo="padrao"):
         """Mascara dados sensíveis para exibição"""
@@ -145,13 +724,18 @@ class Seguranca:
         return f"{numero:08d}"
     
     def log_acesso(self, titular, acao, sucesso=True):
-        """Registra tentativas de acesso para auditoria"""
+        """Registra tentativas de acesso para auditoria (gravação assíncrona em lote)"""
         try:
-            with open("logs_seguranca.txt", "a", encoding="utf-8") as log:
-                from datetime import datetime
-                timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-                status = "SUCESSO" if sucesso else "FALHA"
-                titular_mascarado = self.mascarar_dados_sensveis(titular, "nome")
-                log.write(f"[{timestamp}] {status} - {titular_mascarado} - {acao}\n")
+            timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+            status = "SUCESSO" if sucesso else "FALHA"
+            titular_mascarado = self.mascarar_dados_sensveis(titular, "nome")
+            obter_gravador(self.arquivo_log).registrar_linha_log(f"[{timestamp}] {status} - {titular_mascarado} - {acao}\n")
         except Exception:
-            pass  # Não interrompe o sistema se log falhar
\ No newline at end of file
+            pass  # Não interrompe o sistema se log falhar
+    
+    def descarregar_logs(self):
+        """Aguarda a gravação dos logs pendentes (antes de ler o arquivo de log)"""
+        return obter_gravador(self.arquivo_log).descarregar()
+
+# Workers do processo encerrados na saída (sem processos órfãos nem semáforos vazados)
+atexit.register(Seguranca.encerrar_pools)
\ No newline at end of file
@@ -10,14 +10,14 @@ import os
 def teste_sistema():
     print("🧪 === TESTE DO SISTEMA BANCÁRIO SEGURO ===\n")
     
-    # Remover banco de dados de teste se existir
-    arquivos_teste = ["banco_teste.db", "sistema.key", "logs_seguranca.txt"]
+    # Remover arquivos de teste se existirem
+    arquivos_teste = ["sistema.key", "logs_seguranca.txt"]
     for arquivo in arquivos_teste:
         if os.path.exists(arquivo):
             os.remove(arquivo)
     
-    # Criar banco de dados de teste
-    banco = BancoDados("banco_teste.db")
+    # Criar banco de dados de teste (em memória: sem E/S de disco e sem arquivo a limpar)
+    banco = BancoDados("banco_teste.db", backend="memoria")
     
     print("✅ Banco de dados seguro criado com sucesso!")
     print("🔐 Sistema de criptografia ativado")
@@ -122,8 +122,7 @@ def teste_sistema():
     
     # Teste 11: Verificar criptografia no banco
     print("\n🔍 Teste 11: Verificando criptografia no banco...")
-    import sqlite3
-    conn = sqlite3.connect("banco_teste.db")
+    conn = banco.conectar()
     cursor = conn.cursor()
     
     print("   📋 DADOS CRIPTOGRAFADOS NO BANCO:")
@@ -145,6 +144,7 @@ def teste_sistema():
     
     # Teste 12: Verificar logs de segurança
     print("\n📋 Teste 12: Verificando logs de auditoria...")
+    banco.seguranca.descarregar_logs()
     if os.path.exists("logs_seguranca.txt"):
         with open("logs_seguranca.txt", "r", encoding="utf-8") as log_file:
             logs = log_file.readlines()
@@ -167,7 +167,7 @@ def teste_sistema():
     
     # Verificar arquivos criados
     print(f"\n📁 === ARQUIVOS DE SEGURANÇA ===")
-    for arquivo in ["banco_teste.db", "sistema.key", "logs_seguranca.txt"]:
+    for arquivo in ["sistema.key", "logs_seguranca.txt"]:
         if os.path.exists(arquivo):
             size = os.path.getsize(arquivo)
             print(f"📄 {arquivo}: {size} bytes ({size/1024:.1f} KB)")
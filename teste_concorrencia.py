@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Testes de concorrência: transferências com vários escritores simultâneos
+(total conservado), desistência do compare-and-swap com HTTP 409 e falha
+isolada de uma operação no commit em grupo; criação concorrente do mesmo titular
+"""
+
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import jwt
+from banco_db import BancoDados
+
+falhas = []
+
+def verificar(condicao, descricao):
+    """Imprime o resultado de uma verificação e guarda as falhas"""
+    print(f"   {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas.append(descricao)
+
+def teste_transferencias_concorrentes(diretorio):
+    """Duas instâncias (como dois processos) transferem e depositam ao mesmo tempo nas mesmas contas"""
+    print("\n🔁 Teste: transferências com escritores concorrentes...")
+    nome_db = os.path.join(diretorio, "concorrencia.db")
+    bancos = [BancoDados(nome_db), BancoDados(nome_db)]
+    contas = []
+    for indice, nome in enumerate(["Ana Prado", "Bruno Reis", "Carla Dias", "Davi Lopes"]):
+        conta_id, _ = bancos[0].criar_conta(nome, "senha123", 1000.0)
+        contas.append(conta_id)
+    depositado = []
+
+    def operar(banco, semente):
+        sorteio = random.Random(semente)
+        for _ in range(40):
+            if sorteio.random() < 0.2:
+                conta = sorteio.choice(contas)
+                if banco.depositar(conta, 5.0)[0]:
+                    depositado.append(5.0)
+            else:
+                origem, destino = sorteio.sample(contas, 2)
+                banco.transferir(origem, destino, round(sorteio.uniform(1, 50), 2))
+
+    threads = [threading.Thread(target=operar, args=(bancos[indice % 2], indice)) for indice in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    saldos = [bancos[0].buscar_conta_por_id(conta).saldo for conta in contas]
+    esperado = 4000.0 + sum(depositado)
+    verificar(round(sum(saldos), 2) == round(esperado, 2),
+              f"total conservado (esperado {esperado:.2f}, obtido {sum(saldos):.2f})")
+    livro = [bancos[0].calcular_saldo(conta) for conta in contas]
+    verificar(all(round(saldo, 2) == round(no_livro, 2) for saldo, no_livro in zip(saldos, livro)),
+              "saldo de cada conta igual ao derivado do livro")
+
+    historico = bancos[0].obter_historico(contas[1])
+    numero_origem = bancos[0].buscar_conta_por_id(contas[0]).numero_conta
+    verificar(not any(numero_origem in str(linha) for linha in historico),
+              "histórico não mostra o número completo da outra conta")
+    for banco in bancos:
+        banco.fechar()
+
+def teste_conflito_retorna_409(diretorio):
+    """Outro processo altera a conta a cada tentativa: a transferência desiste e a API responde 409"""
+    print("\n⚔️  Teste: conflitos persistentes de versão...")
+    import api_banco
+
+    nome_db = os.path.join(diretorio, "conflito.db")
+    banco = BancoDados(nome_db)
+    origem, _ = banco.criar_conta("Elisa Moura", "senha123", 500.0)
+    destino, numero_destino = banco.criar_conta("Fabio Nunes", "senha123", 0.0)
+
+    # Depois de cada leitura, outro "processo" grava na conta de origem (versão muda antes do compare-and-swap)
+    ler_saldos_versoes = banco._ler_saldos_versoes
+    def ler_e_concorrer(contas_ids):
+        lidas = ler_saldos_versoes(contas_ids)
+        outro_processo = sqlite3.connect(nome_db)
+        outro_processo.execute("UPDATE contas SET versao = versao + 1 WHERE id = ?", (origem,))
+        outro_processo.commit()
+        outro_processo.close()
+        return lidas
+    banco._ler_saldos_versoes = ler_e_concorrer
+
+    api_banco.banco = banco
+    token = jwt.encode({'user_id': origem, 'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=5)},
+                       api_banco.app.config['SECRET_KEY'], algorithm='HS256')
+    resposta = api_banco.app.test_client().post('/api/transferencia', json={'conta_destino': numero_destino, 'valor': 100.0},
+                                                headers={'Authorization': f'Bearer {token}'})
+    verificar(resposta.status_code == 409, f"API responde 409 (obtido {resposta.status_code})")
+
+    banco._ler_saldos_versoes = ler_saldos_versoes
+    verificar(banco.buscar_conta_por_id(origem).saldo == 500.0, "saldo de origem intacto")
+    verificar(banco.buscar_conta_por_id(destino).saldo == 0.0, "saldo de destino intacto")
+    verificar(banco.obter_historico(destino) == [], "nenhuma transação gravada")
+    banco.fechar()
+
+def teste_falha_no_commit_em_grupo(diretorio):
+    """Uma operação que falha no meio de um lote é desfeita sozinha; as demais do lote são confirmadas"""
+    print("\n📦 Teste: falha de uma operação no commit em grupo...")
+    nome_db = os.path.join(diretorio, "commit_em_grupo.db")
+    banco = BancoDados(nome_db, commit_em_grupo=True, espera_commit=0.5)
+    conta_id, _ = banco.criar_conta("Gustavo Lima", "senha123", 0.0)
+
+    conexoes = []
+    def depositar(valor, falhar=False):
+        def operacao(cursor):
+            conexoes.append(cursor.connection)
+            banco._inserir_transacao(cursor, conta_id, "DEPOSITO", valor, f"lote {valor}")
+            if falhar:
+                raise ValueError("falha simulada depois de gravar")
+            return valor
+        return operacao
+
+    valores = [1.0, 2.0, 4.0, 8.0, 16.0]
+    futuros = [banco.commit_em_grupo.submeter(depositar(valor, falhar=(valor == 4.0))) for valor in valores]
+    resultados = []
+    for futuro in futuros:
+        try:
+            resultados.append(futuro.result(10))
+        except ValueError:
+            resultados.append("erro")
+
+    verificar(len(conexoes) == len(valores) and all(conn is conexoes[0] for conn in conexoes),
+              "todas as operações no mesmo lote (mesma transação)")
+    verificar(resultados == [1.0, 2.0, "erro", 8.0, 16.0], f"só a operação que falhou recebe a exceção ({resultados})")
+    gravados = sorted(float(linha[1]) for linha in banco.obter_historico(conta_id))
+    verificar(gravados == [1.0, 2.0, 8.0, 16.0], f"demais operações confirmadas, a que falhou desfeita ({gravados})")
+    verificar(banco.calcular_saldo(conta_id) == 27.0, "saldo do livro sem a operação desfeita")
+    banco.fechar()
+
+def teste_titular_duplicado_concorrente(diretorio):
+    """Vários criar_conta simultâneos do mesmo titular (em duas instâncias) criam uma única conta"""
+    print("\n👥 Teste: criação concorrente do mesmo titular...")
+    nome_db = os.path.join(diretorio, "duplicados.db")
+    bancos = [BancoDados(nome_db), BancoDados(nome_db)]
+    resultados = []
+
+    def criar(banco):
+        resultados.append(banco.criar_conta("Duda Duplicada", "senha123", 10.0))
+
+    threads = [threading.Thread(target=criar, args=(bancos[indice % 2],)) for indice in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    criadas = [conta_id for conta_id, _ in resultados if conta_id]
+    verificar(len(criadas) == 1, f"uma única conta criada ({len(criadas)})")
+    recusas = [mensagem for conta_id, mensagem in resultados if not conta_id]
+    verificar(all(mensagem == "Conta já existe para este titular" for mensagem in recusas),
+              f"as demais recusadas como duplicadas ({recusas})")
+    conn = sqlite3.connect(nome_db)
+    contas, transacoes = conn.execute("SELECT (SELECT COUNT(*) FROM contas), (SELECT COUNT(*) FROM transacoes)").fetchone()
+    conn.close()
+    verificar((contas, transacoes) == (1, 1), f"uma conta e um saldo inicial gravados ({contas}, {transacoes})")
+    for banco in bancos:
+        banco.fechar()
+
+def main():
+    print("🧵 === TESTE DE CONCORRÊNCIA ===")
+    with tempfile.TemporaryDirectory() as diretorio:
+        teste_transferencias_concorrentes(diretorio)
+        teste_conflito_retorna_409(diretorio)
+        teste_falha_no_commit_em_grupo(diretorio)
+        teste_titular_duplicado_concorrente(diretorio)
+
+    if falhas:
+        print(f"\n❌ {len(falhas)} verificação(ões) falharam")
+        sys.exit(1)
+    print("\n✅ === TODOS OS TESTES DE CONCORRÊNCIA PASSARAM ===")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Testes do livro de transações: saldos derivados com checkpoints, importação
+com datas retroativas, arquivamento por mês e paginação por cursor
+"""
+
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import jwt
+from banco_db import BancoDados
+
+falhas = []
+
+def verificar(condicao, descricao):
+    """Imprime o resultado de uma verificação e guarda as falhas"""
+    print(f"   {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas.append(descricao)
+
+def teste_importacao_retroativa(diretorio):
+    """Transações importadas com datas antigas não entram em checkpoints de datas passadas"""
+    print("\n📥 Teste: importação com datas retroativas...")
+    banco = BancoDados("teste_livro_importacao.db", backend="memoria")
+    conta_id, _ = banco.criar_conta("Importação Retroativa", "senha123", 100.0)
+
+    caminho = os.path.join(diretorio, "retroativas.csv")
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        arquivo.write("conta_id,tipo,valor,data\n")
+        for dia in (1, 2, 3):
+            arquivo.write(f"{conta_id},DEPOSITO,1.00,2020-01-0{dia} 10:00:00\n")
+    resumo = banco.importar_transacoes(caminho)
+    verificar(resumo['importadas'] == 3, f"3 transações importadas ({resumo['importadas']})")
+
+    banco.registrar_checkpoint(conta_id)
+    verificar(banco.calcular_saldo(conta_id) == 103.0, "saldo atual inclui as importadas")
+    saldo_2021 = banco.calcular_saldo(conta_id, "2021-01-01")
+    verificar(saldo_2021 == 3.0, f"saldo em 2021-01-01 só com as importadas (esperado 3.0, obtido {saldo_2021})")
+    periodo = banco.saldos_periodo(conta_id, "2020-01-02", "2021-01-01")
+    verificar(periodo == (1.0, 3.0), f"saldos do período 2020-01-02 a 2021-01-01 (esperado (1.0, 3.0), obtido {periodo})")
+    banco.fechar()
+
+def paginas_historico(banco, conta_id, limite=4):
+    """Percorre o histórico página a página e devolve a lista de páginas"""
+    paginas, cursor = [], None
+    while True:
+        pagina, cursor = banco.obter_pagina_historico(conta_id, limite=limite, antes_de=cursor)
+        paginas.append(pagina)
+        if not cursor:
+            return paginas
+
+def teste_arquivamento(diretorio):
+    """Arquivar meses antigos não muda histórico, paginação nem saldos em datas passadas"""
+    print("\n🗄️  Teste: arquivamento de meses antigos...")
+    nome_db = os.path.join(diretorio, "arquivamento.db")
+    banco = BancoDados(nome_db)
+    conta_id, _ = banco.criar_conta("Arquivo Mensal", "senha123", 50.0)
+    outra_id, _ = banco.criar_conta("Outra Conta", "senha123", 0.0)
+    for valor in (10.0, 20.0, 30.0, 40.0, 50.0, 60.0):
+        banco.depositar(conta_id, valor)
+    banco.transferir(conta_id, outra_id, 15.0)
+    banco.sacar(conta_id, 5.0)
+
+    # Os primeiros lançamentos passam para março e abril de 2020
+    conn = sqlite3.connect(nome_db)
+    ids = [linha[0] for linha in conn.execute("SELECT id FROM transacoes ORDER BY id")]
+    for posicao, transacao_id in enumerate(ids[:5]):
+        mes = 3 if posicao < 3 else 4
+        conn.execute("UPDATE transacoes SET data_transacao = ? WHERE id = ?",
+                     (f"2020-0{mes}-{posicao + 5:02d} 12:00:00", transacao_id))
+    conn.commit()
+    conn.close()
+
+    datas = ["2020-03-06", "2020-03-31", "2020-04-30", "2021-01-01"]
+    def retrato():
+        return {
+            'historico': [banco.obter_historico(conta) for conta in (conta_id, outra_id)],
+            'paginas': paginas_historico(banco, conta_id),
+            'iterado': list(banco.iterar_historico(conta_id)),
+            'saldos': [banco.calcular_saldo(conta_id, data) for data in datas],
+            'periodo': banco.saldos_periodo(conta_id, "2020-03-07", "2020-04-30"),
+            'atual': banco.calcular_saldo(conta_id),
+        }
+    antes = retrato()
+
+    arquivados = banco.arquivar_transacoes(dias=365, diretorio=os.path.join(diretorio, "arquivos"))
+    verificar(arquivados == {'2020-03': 3, '2020-04': 2}, f"meses antigos arquivados ({arquivados})")
+    conn = sqlite3.connect(nome_db)
+    restantes = conn.execute("SELECT COUNT(*) FROM transacoes WHERE conta_id = ?", (conta_id,)).fetchone()[0]
+    conn.close()
+    # Todas as linhas menos as 5 arquivadas e o crédito da transferência na outra conta
+    verificar(restantes == len(ids) - 5 - 1, f"linhas arquivadas saem da tabela viva ({restantes} restantes)")
+
+    depois = retrato()
+    for chave in antes:
+        verificar(depois[chave] == antes[chave], f"{chave} igual ao de antes do arquivamento")
+    verificar(len(antes['paginas']) > 1, f"paginação com várias páginas ({len(antes['paginas'])})")
+    banco.fechar()
+
+def teste_leituras_concorrentes_com_arquivo(diretorio):
+    """Leituras simultâneas que passam por um mês arquivado não esgotam o pool de leitura"""
+    print("\n📚 Teste: leituras concorrentes que chegam ao arquivo...")
+    nome_db = os.path.join(diretorio, "leituras_arquivo.db")
+    banco = BancoDados(nome_db, tamanho_pool_leitura=2)
+    banco.pool_leitura.timeout = 3.0
+    conta_id, _ = banco.criar_conta("Leitura Concorrente", "senha123", 10.0)
+    for valor in (1.0, 2.0, 3.0, 4.0):
+        banco.depositar(conta_id, valor)
+    conn = sqlite3.connect(nome_db)
+    conn.execute("UPDATE transacoes SET data_transacao = '2020-06-01 09:00:00' WHERE id <= 2")
+    conn.commit()
+    conn.close()
+    banco.arquivar_transacoes(dias=365, diretorio=os.path.join(diretorio, "arquivos_leitura"))
+
+    # Cada leitor pega a primeira linha (tabela viva, com a conexão do pool) e só então todos seguem
+    # juntos para o mês arquivado
+    leitores = 2
+    barreira = threading.Barrier(leitores)
+    resultados, erros = [], []
+
+    def ler():
+        try:
+            historico = banco.iterar_historico(conta_id, tamanho_lote=1)
+            linhas = [next(historico)]
+            barreira.wait(timeout=10)
+            linhas.extend(historico)
+            resultados.append(len(linhas))
+        except Exception as erro:
+            erros.append(repr(erro))
+
+    threads = [threading.Thread(target=ler) for _ in range(leitores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    verificar(not erros, f"nenhuma leitura falhou ({erros})")
+    verificar(resultados == [5] * leitores, f"cada leitura viu as 5 transações ({resultados})")
+    banco.fechar()
+
+def teste_paginacao_por_cursor(diretorio):
+    """Páginas seguidas pelo cursor cobrem o histórico sem repetir nem pular linhas, mesmo com datas iguais na divisa"""
+    print("\n📄 Teste: paginação por cursor...")
+    nome_db = os.path.join(diretorio, "paginacao.db")
+    banco = BancoDados(nome_db)
+    conta_id, _ = banco.criar_conta("Pagina Cursor", "senha123", 1.0)
+    for valor in range(2, 9):
+        banco.depositar(conta_id, float(valor))
+
+    # Quatro transações no mesmo segundo: a divisa entre páginas cai entre elas (desempate pelo id)
+    conn = sqlite3.connect(nome_db)
+    conn.execute("UPDATE transacoes SET data_transacao = '2024-05-01 10:00:00' WHERE id BETWEEN 2 AND 5")
+    conn.commit()
+    conn.close()
+
+    completo = banco.obter_historico(conta_id)
+    paginas = paginas_historico(banco, conta_id, limite=3)
+    verificar([len(pagina) for pagina in paginas] == [3, 3, 2], f"páginas de 3, 3 e 2 linhas ({[len(p) for p in paginas]})")
+    verificar(sum(paginas, []) == completo, "páginas concatenadas iguais ao histórico completo")
+
+    import api_banco
+    api_banco.banco = banco
+    token = jwt.encode({'user_id': conta_id, 'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=5)},
+                       api_banco.app.config['SECRET_KEY'], algorithm='HS256')
+    cliente = api_banco.app.test_client()
+    cabecalhos = {'Authorization': f'Bearer {token}'}
+
+    valores, cursor, requisicoes = [], None, 0
+    while True:
+        parametros = {'limite': 3, **({'antes_de': cursor} if cursor else {})}
+        dados = cliente.get('/api/historico', query_string=parametros, headers=cabecalhos).get_json()
+        valores.extend(transacao['valor'] for transacao in dados['transacoes'])
+        cursor, requisicoes = dados['proximo_cursor'], requisicoes + 1
+        if not cursor:
+            break
+    verificar(requisicoes == 3 and valores == [float(linha[1]) for linha in completo],
+              f"API percorre as páginas pelo proximo_cursor ({requisicoes} requisições, {valores})")
+
+    for parametros in ({'data_inicio': '2024-13-45'}, {'data_fim': 'ontem'}, {'data_inicio': "2024-05-01' OR 1=1"}):
+        resposta = cliente.get('/api/historico', query_string=parametros, headers=cabecalhos)
+        verificar(resposta.status_code == 400, f"data de filtro malformada {parametros} responde 400 (obtido {resposta.status_code})")
+    resposta = cliente.get('/api/historico', query_string={'data_inicio': '2024-05-01', 'data_fim': '2024-05-01'},
+                           headers=cabecalhos)
+    verificar(resposta.status_code == 200 and resposta.get_json()['total'] == 4,
+              f"filtro de um dia devolve as 4 transações dele ({resposta.get_json().get('total')})")
+    banco.fechar()
+
+def main():
+    print("📒 === TESTE DO LIVRO DE TRANSAÇÕES ===")
+    with tempfile.TemporaryDirectory() as diretorio:
+        teste_importacao_retroativa(diretorio)
+        teste_arquivamento(diretorio)
+        teste_leituras_concorrentes_com_arquivo(diretorio)
+        teste_paginacao_por_cursor(diretorio)
+
+    if falhas:
+        print(f"\n❌ {len(falhas)} verificação(ões) falharam")
+        sys.exit(1)
+    print("\n✅ === TODOS OS TESTES DO LIVRO PASSARAM ===")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Teste da rotação de chave: interrupção e retomada, login pelo índice cego
+com duas chaves no chaveiro e recifragem dos arquivos mensais
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from banco_db import BancoDados, COLUNAS_CRIPTOGRAFADAS
+from seguranca import CifraCampos
+
+falhas = []
+
+def verificar(condicao, descricao):
+    """Imprime o resultado de uma verificação e guarda as falhas"""
+    print(f"   {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas.append(descricao)
+
+def ilegiveis_com_a_chave(caminho_db, tabelas, chave):
+    """Conta os valores cifrados das tabelas que a chave informada, sozinha, não decifra"""
+    cifra = CifraCampos([chave])
+    conn = sqlite3.connect(caminho_db)
+    ilegiveis = 0
+    for tabela in tabelas:
+        for linha in conn.execute(f"SELECT {', '.join(COLUNAS_CRIPTOGRAFADAS[tabela])} FROM {tabela}"):
+            for valor in linha:
+                if valor is None:
+                    continue
+                try:
+                    cifra.descriptografar(bytes(valor))
+                except Exception:
+                    ilegiveis += 1
+    conn.close()
+    return ilegiveis
+
+def teste_rotacao_chave():
+    print("\n🔑 Teste: rotação interrompida e retomada...")
+    banco = BancoDados("rotacao.db")
+    titulares = ["Gabriela Rocha", "Heitor Campos", "Iris Matos", "Jonas Freitas", "Karen Vidal"]
+    contas = [banco.criar_conta(titular, "senha123", 100.0)[0] for titular in titulares]
+    for rodada in range(3):
+        for conta in contas:
+            banco.depositar(conta, 10.0 + rodada)
+
+    # Metade das transações vai para um arquivo mensal antigo
+    conn = sqlite3.connect("rotacao.db")
+    conn.execute("UPDATE transacoes SET data_transacao = '2020-05-10 12:00:00' WHERE id % 2 = 0")
+    conn.commit()
+    conn.close()
+    arquivados = banco.arquivar_transacoes(dias=365, diretorio="arquivos")
+    verificar(arquivados.get('2020-05', 0) > 0, f"transações arquivadas em 2020-05 ({arquivados})")
+
+    antes = {conta: (banco.buscar_conta_por_id(conta).saldo, banco.obter_historico(conta),
+                     banco.calcular_saldo(conta, "2020-12-31")) for conta in contas}
+
+    # Interrupção depois do primeiro lote de contas: parte dos índices cegos já usa a nova chave
+    recriptografar_lote = banco.seguranca.recriptografar_lote
+    chamadas = []
+    def falhar_no_segundo_lote(valores, tamanho_bloco=None):
+        chamadas.append(1)
+        if len(chamadas) > 1:
+            raise RuntimeError("queda simulada")
+        return recriptografar_lote(valores, tamanho_bloco)
+    banco.seguranca.recriptografar_lote = falhar_no_segundo_lote
+    try:
+        banco.rotacionar_chave(tamanho_lote=2)
+        verificar(False, "rotação interrompida")
+    except RuntimeError:
+        verificar(True, "rotação interrompida")
+    banco.seguranca.recriptografar_lote = recriptografar_lote
+
+    chaves = banco.seguranca.chaves.obter_chaves()
+    verificar(len(chaves) == 2, f"duas chaves no chaveiro durante a rotação ({len(chaves)})")
+    logins = [banco.autenticar_usuario(titular, "senha123")[0] is not None for titular in titulares]
+    verificar(all(logins), f"login pelo índice cego com índices das duas chaves ({sum(logins)}/{len(logins)})")
+    verificar(banco.criar_conta(titulares[-1], "outra123", 1.0)[0] is None,
+              "duplicidade detectada pelo índice cego da chave antiga")
+
+    resumo = banco.rotacionar_chave(tamanho_lote=2)
+    verificar(resumo['retomada'], "segunda execução retoma a rotação pendente")
+    verificar(resumo['recriptografados'].get('arquivo:2020-05', 0) > 0,
+              f"arquivo mensal recifrado ({resumo['recriptografados']})")
+    verificar(len(banco.seguranca.chaves.obter_chaves()) == 2, "chave antiga mantida no chaveiro por padrão")
+
+    depois = {conta: (banco.buscar_conta_por_id(conta).saldo, banco.obter_historico(conta),
+                      banco.calcular_saldo(conta, "2020-12-31")) for conta in contas}
+    verificar(depois == antes, "saldos, históricos e saldos passados iguais aos de antes")
+
+    nova_chave = banco.seguranca.chaves.obter_chaves()[0]
+    verificar(ilegiveis_com_a_chave("rotacao.db", list(COLUNAS_CRIPTOGRAFADAS), nova_chave) == 0,
+              "banco todo legível só com a nova chave")
+    verificar(ilegiveis_com_a_chave(os.path.join("arquivos", "transacoes_2020_05.db"), ['transacoes'], nova_chave) == 0,
+              "arquivo mensal legível só com a nova chave")
+    banco.fechar()
+
+def main():
+    print("🔐 === TESTE DE ROTAÇÃO DE CHAVE ===")
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as diretorio:
+        # sistema.key próprio do teste: a rotação não mexe no chaveiro do diretório do projeto
+        os.chdir(diretorio)
+        try:
+            teste_rotacao_chave()
+        finally:
+            os.chdir(diretorio_original)
+
+    if falhas:
+        print(f"\n❌ {len(falhas)} verificação(ões) falharam")
+        sys.exit(1)
+    print("\n✅ === TODOS OS TESTES DE ROTAÇÃO PASSARAM ===")
+
+if __name__ == "__main__":
+    main()
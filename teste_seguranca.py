@@ -5,7 +5,29 @@ Script de teste para o sistema bancário SEGURO
 
 from banco_db import BancoDados
 from main import ContaBancaria
+import datetime
+import multiprocessing
 import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import base64
+import jwt
+from cryptography.fernet import Fernet
+from migracoes import MIGRACOES
+from seguranca import Seguranca, derivar_senha, _hash_senha_legado
+
+falhas = []
+
+def verificar(condicao, descricao):
+    """Imprime o resultado de uma verificação e guarda as falhas"""
+    print(f"   {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas.append(descricao)
 
 def teste_sistema_seguro():
     print("🔐 === TESTE DO SISTEMA BANCÁRIO SEGURO ===\n")
@@ -115,6 +137,7 @@ def teste_sistema_seguro():
     
     # Teste 8: Verificar logs de segurança
     print("\n📋 Teste 8: Logs de segurança gerados...")
+    banco.seguranca.descarregar_logs()
     if os.path.exists("logs_seguranca.txt"):
         with open("logs_seguranca.txt", "r", encoding="utf-8") as log_file:
             logs = log_file.readlines()
@@ -149,5 +172,227 @@ def teste_sistema_seguro():
             size = os.path.getsize(arquivo)
             print(f"📄 {arquivo}: {size} bytes")
 
+def teste_valores_nao_finitos(diretorio):
+    """NaN e infinito são recusados em depósitos, saques, transferências, na API e na importação"""
+    print("\n🚫 Teste: valores não finitos...")
+    banco = BancoDados("teste_nao_finitos.db", backend="memoria")
+    conta_id, _ = banco.criar_conta("Valor Invalido", "senha123", 100.0)
+    outra_id, numero_outra = banco.criar_conta("Outra Invalida", "senha123", 0.0)
+
+    for valor in (float('nan'), float('inf'), float('-inf')):
+        verificar(banco.depositar(conta_id, valor)[0] is None, f"depósito de {valor} recusado")
+        verificar(banco.sacar(conta_id, valor)[0] is None, f"saque de {valor} recusado")
+        verificar(banco.transferir(conta_id, outra_id, valor)[0] is None, f"transferência de {valor} recusada")
+
+    import api_banco
+    api_banco.banco = banco
+    token = jwt.encode({'user_id': conta_id, 'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=5)},
+                       api_banco.app.config['SECRET_KEY'], algorithm='HS256')
+    cliente = api_banco.app.test_client()
+    cabecalhos = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    for rota, corpo in (('/api/deposito', '{"valor": NaN}'), ('/api/saque', '{"valor": NaN}'),
+                        ('/api/saque', '{"valor": Infinity}'),
+                        ('/api/transferencia', f'{{"valor": NaN, "conta_destino": "{numero_outra}"}}')):
+        resposta = cliente.post(rota, data=corpo, headers=cabecalhos)
+        verificar(resposta.status_code == 400, f"{rota} com {corpo} responde 400 (obtido {resposta.status_code})")
+
+    caminho = os.path.join(diretorio, "nao_finitos.csv")
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        arquivo.write("conta_id,tipo,valor\n")
+        arquivo.write(f"{conta_id},DEPOSITO,nan\n{conta_id},DEPOSITO,inf\n{conta_id},DEPOSITO,1.00\n")
+    resumo = banco.importar_transacoes(caminho)
+    verificar(resumo['importadas'] == 1 and resumo['rejeitadas'] == 2,
+              f"importação recusa nan e inf ({resumo['importadas']} importadas, {resumo['rejeitadas']} rejeitadas)")
+
+    saldo = banco.buscar_conta_por_id(conta_id).saldo
+    verificar(saldo == 101.0, f"saldo continua finito (esperado 101.0, obtido {saldo})")
+    banco.fechar()
+
+def teste_hash_senha(diretorio):
+    """Hash legado (SHA-256) ainda verifica, é refeito no login, e o hash segue sem o pool de processos"""
+    print("\n🔑 Teste: hash de senha...")
+    chave_arquivo = os.path.join(diretorio, "hash.key")
+    seguranca = Seguranca(chave_arquivo, iteracoes_senha=20_000, processos_hash=1)
+
+    salt = seguranca.gerar_salt()
+    legado = _hash_senha_legado("senha123", salt)
+    verificar(seguranca.verificar_senha("senha123", legado, salt), "hash SHA-256 legado aceita a senha certa")
+    verificar(not seguranca.verificar_senha("senha456", legado, salt), "hash SHA-256 legado recusa a senha errada")
+    verificar(seguranca.precisa_rehash(legado), "hash legado precisa de rehash")
+
+    atual, salt_atual = seguranca.hash_senha("senha123")
+    verificar(atual.startswith("pbkdf2_sha256$20000$"), f"formato versionado com o custo configurado ({atual[:24]}...)")
+    verificar(seguranca.verificar_senha("senha123", atual, salt_atual), "hash PBKDF2 aceita a senha certa")
+    verificar(not seguranca.precisa_rehash(atual), "hash com o custo configurado não precisa de rehash")
+    verificar(Seguranca(chave_arquivo, iteracoes_senha=40_000, processos_hash=0).precisa_rehash(atual),
+              "hash mais barato que o custo configurado precisa de rehash")
+
+    # Rehash no login: conta gravada com o hash legado passa ao formato atual
+    nome_db = os.path.join(diretorio, "hash.db")
+    banco = BancoDados(nome_db, iteracoes_senha=20_000, processos_hash=1)
+    conta_id, _ = banco.criar_conta("Hash Legado", "senha123", 0.0)
+    conn = sqlite3.connect(nome_db)
+    conn.execute("UPDATE contas SET hash_senha = ?, salt_senha = ? WHERE id = ?", (legado, salt, conta_id))
+    conn.commit()
+
+    def hash_gravado():
+        return conn.execute("SELECT hash_senha FROM contas WHERE id = ?", (conta_id,)).fetchone()[0]
+
+    verificar(banco.autenticar_usuario("Hash Legado", "senha456")[0] is None, "login com hash legado recusa a senha errada")
+    verificar(hash_gravado() == legado, "senha errada não refaz o hash")
+    verificar(banco.autenticar_usuario("Hash Legado", "senha123")[0] is not None, "login com hash legado aceita a senha certa")
+    verificar(hash_gravado().startswith("pbkdf2_sha256$20000$"), "hash refeito no formato atual depois do login")
+    verificar(banco.autenticar_usuario("Hash Legado", "senha123")[0] is not None, "login com o hash refeito")
+    banco.fechar()
+
+    banco = BancoDados(nome_db, iteracoes_senha=30_000, processos_hash=1)
+    verificar(banco.autenticar_usuario("Hash Legado", "senha123")[0] is not None, "login depois de aumentar o custo")
+    verificar(hash_gravado().startswith("pbkdf2_sha256$30000$"), "hash refeito com o novo custo")
+    banco.fechar()
+    conn.close()
+
+    # Sem pool (processos_hash=0) o hash é calculado na própria thread
+    sem_pool = Seguranca(chave_arquivo, iteracoes_senha=20_000, processos_hash=0)
+    direto, salt_direto = sem_pool.hash_senha("senha123")
+    verificar(direto.split("$")[3] == derivar_senha("senha123", salt_direto, 20_000), "hash sem pool de processos")
+
+    # Pool quebrado (worker morto): o pedido é calculado em linha e o pool é trocado no pedido seguinte
+    processos = 3
+    quebrado = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        quebrado.submit(os._exit, 1).result()
+    except BrokenProcessPool:
+        pass
+    Seguranca._pools_hash[processos] = (quebrado, threading.BoundedSemaphore(processos))
+    com_pool = Seguranca(chave_arquivo, iteracoes_senha=20_000, processos_hash=processos)
+    recuperado, salt_recuperado = com_pool.hash_senha("senha123")
+    verificar(com_pool.verificar_senha("senha123", recuperado, salt_recuperado), "hash calculado em linha com o pool quebrado")
+    verificar(Seguranca._pools_hash.get(processos, (None,))[0] is not quebrado, "pool quebrado descartado")
+    outro, salt_outro = com_pool.hash_senha("senha123")
+    verificar(com_pool.verificar_senha("senha123", outro, salt_outro) and processos in Seguranca._pools_hash,
+              "pedido seguinte usa um pool novo")
+
+def teste_preenchimento_indice_cego(diretorio):
+    """Banco anterior ao índice cego: a migração preenche titular_indice e o login passa a usá-lo"""
+    print("\n🗂️  Teste: preenchimento do índice cego em banco existente...")
+    nome_db = os.path.join(diretorio, "sem_indice.db")
+    seguranca = Seguranca()
+    fernet = Fernet(seguranca.obter_chave_criptografia())
+
+    def cifrar_antigo(texto):
+        return base64.b64encode(fernet.encrypt(texto.encode('utf-8'))).decode('utf-8')
+
+    # Esquema e formato de antes do índice cego: user_version 0, valores em TEXT, hash SHA-256
+    conn = sqlite3.connect(nome_db)
+    MIGRACOES[0](None, conn.cursor())
+    titulares = ["Ana Antiga", "Bento Antigo", "Clara Antiga"]
+    for posicao, titular in enumerate(titulares):
+        salt = seguranca.gerar_salt()
+        conn.execute("""
+            INSERT INTO contas (numero_conta, titular_criptografado, hash_senha, salt_senha, saldo_criptografado)
+            VALUES (?, ?, ?, ?, ?)
+        """, (f"1000000{posicao}", cifrar_antigo(titular), _hash_senha_legado("senha123", salt), salt, cifrar_antigo("50.0")))
+    conn.commit()
+
+    banco = BancoDados(nome_db)
+    indices = dict(conn.execute("SELECT numero_conta, titular_indice FROM contas"))
+    verificar(None not in indices.values(), f"todas as contas com índice cego ({len(indices)})")
+    verificar([indices[f"1000000{posicao}"] for posicao in range(3)] == [seguranca.calcular_indice_cego(t) for t in titulares],
+              "índice de cada conta igual ao calculado do titular")
+    plano = " ".join(linha[3] for linha in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM contas WHERE titular_indice IN (?)", (indices["10000001"],)))
+    verificar("idx_contas_titular_indice" in plano, f"busca pelo índice ({plano})")
+    conn.close()
+
+    conta, mensagem = banco.autenticar_usuario("bento antigo", "senha123")
+    verificar(conta is not None and conta['numero_conta'] == "10000001", f"login pelo índice preenchido ({mensagem})")
+    verificar(banco.criar_conta("Clara Antiga", "outra123", 0.0)[0] is None, "duplicidade detectada em conta preenchida")
+    banco.fechar()
+
+def teste_cache_apos_rotacao(diretorio):
+    """O cache de descriptografia é esvaziado quando o chaveiro muda e não devolve valores de chaves removidas"""
+    print("\n🧠 Teste: cache de descriptografia e rotação de chave...")
+    chave_arquivo = os.path.join(diretorio, "cache.key")
+    seguranca = Seguranca(chave_arquivo, cache_descriptografia=True)
+    cifrado = seguranca.criptografar_dados("1500.75")
+    seguranca.descriptografar_dados(cifrado)
+    seguranca.descriptografar_dados(cifrado)
+    verificar(seguranca.cache.estatisticas()['acertos'] == 1, "segunda leitura vem do cache")
+
+    chave_antiga = seguranca.obter_chave_criptografia()
+    seguranca.adicionar_chave_principal()
+    verificar(seguranca.cache.estatisticas()['itens'] == 0, "nova chave principal esvazia o cache")
+    verificar(seguranca.descriptografar_dados(cifrado) == "1500.75", "valor antigo legível com a chave antiga no chaveiro")
+
+    # Outra instância (como outro BancoDados do processo) remove a chave antiga
+    outra = Seguranca(chave_arquivo)
+    outra.gravar_chaveiro(outra.chaves.obter_chaves()[:1])
+    verificar(seguranca.descriptografar_dados(cifrado) != "1500.75", "valor da chave removida não sai do cache")
+
+    # Outro processo regrava o arquivo: percebido na verificação seguinte do chaveiro
+    seguranca.gravar_chaveiro([chave_antiga])
+    verificar(seguranca.descriptografar_dados(cifrado) == "1500.75", "chave antiga de volta ao chaveiro")
+    with open(chave_arquivo, 'wb') as arquivo:
+        arquivo.write(Fernet.generate_key() + b"\n")
+    time.sleep(seguranca.chaves.intervalo_verificacao + 0.1)
+    verificar(seguranca.descriptografar_dados(cifrado) != "1500.75", "chaveiro regravado por outro processo esvazia o cache")
+
+    # Rotação completa do BancoDados com remoção da chave antiga (sistema.key próprio, no diretório do teste)
+    diretorio_original = os.getcwd()
+    os.chdir(diretorio)
+    try:
+        banco = BancoDados("cache_rotacao.db", cache_descriptografia=True)
+        conta_id, _ = banco.criar_conta("Cache Rotacao", "senha123", 80.0)
+        conta = banco.buscar_conta_por_id(conta_id)
+        saldo_cifrado = conta._saldo_criptografado
+        verificar(banco.seguranca.descriptografar_dados(saldo_cifrado) == "80.0", "saldo lido (e guardado no cache)")
+        banco.rotacionar_chave(remover_chave_antiga=True)
+        verificar(banco.seguranca.descriptografar_dados(saldo_cifrado) != "80.0",
+                  "depois da rotação o saldo cifrado com a chave removida não vem do cache")
+        verificar(banco.buscar_conta_por_id(conta_id).saldo == 80.0, "saldo recifrado legível depois da rotação")
+        banco.fechar()
+    finally:
+        os.chdir(diretorio_original)
+
+def teste_aes_gcm_le_fernet(diretorio):
+    """Banco gravado com Fernet segue legível com AES-GCM como suíte padrão, inclusive misturado"""
+    print("\n🔐 Teste: AES-GCM lendo valores gravados com Fernet...")
+    nome_db = os.path.join(diretorio, "suites.db")
+    banco = BancoDados(nome_db, cifra="fernet")
+    conta_id, _ = banco.criar_conta("Suite Mista", "senha123", 100.0)
+    banco.depositar(conta_id, 25.0)
+    banco.fechar()
+
+    banco = BancoDados(nome_db, cifra="aes-gcm")
+    verificar(banco.buscar_conta_por_id(conta_id).saldo == 125.0, "saldo gravado com Fernet lido com AES-GCM")
+    verificar(banco.autenticar_usuario("Suite Mista", "senha123")[0] is not None, "login com titular gravado com Fernet")
+    banco.sacar(conta_id, 5.0)
+    historico = banco.obter_historico(conta_id)
+    verificar(sorted(float(linha[1]) for linha in historico) == [5.0, 25.0, 100.0],
+              f"histórico misto Fernet/AES-GCM legível ({[linha[1] for linha in historico]})")
+    verificar(banco.buscar_conta_por_id(conta_id).saldo == 120.0 and banco.calcular_saldo(conta_id) == 120.0,
+              "saldo e livro corretos depois da escrita com AES-GCM")
+
+    conn = sqlite3.connect(nome_db)
+    versoes = [bytes(valor)[0] for (valor,) in conn.execute("SELECT valor_criptografado FROM transacoes ORDER BY id")]
+    conn.close()
+    verificar(versoes == [1, 1, 2], f"versões gravadas: Fernet antes, AES-GCM depois ({versoes})")
+
+    # Valor TEXT legado (base64 do token Fernet, anterior ao formato binário)
+    fernet = Fernet(banco.seguranca.obter_chave_criptografia())
+    legado = base64.b64encode(fernet.encrypt(b"42.5")).decode('utf-8')
+    verificar(banco.seguranca.descriptografar_dados(legado) == "42.5", "valor TEXT legado lido com AES-GCM padrão")
+    banco.fechar()
+
 if __name__ == "__main__":
-    teste_sistema_seguro()
\ No newline at end of file
+    teste_sistema_seguro()
+    with tempfile.TemporaryDirectory() as diretorio:
+        teste_valores_nao_finitos(diretorio)
+        teste_hash_senha(diretorio)
+        teste_preenchimento_indice_cego(diretorio)
+        teste_cache_apos_rotacao(diretorio)
+        teste_aes_gcm_le_fernet(diretorio)
+    
+    if falhas:
+        print(f"\n❌ {len(falhas)} verificação(ões) falharam")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,72 @@
+import threading
+import time
+from contextlib import contextmanager
+
+class GerenciadorTravas:
+    """Travas por conta em faixas fixas: operações na mesma conta se serializam, contas diferentes seguem em paralelo"""
+
+    def __init__(self, numero_faixas=64):
+        self.numero_faixas = numero_faixas
+        self._faixas = [threading.Lock() for _ in range(numero_faixas)]
+
+        # Contadores por faixa (atualizados só por quem detém a faixa, sem trava extra)
+        self._aquisicoes = [0] * numero_faixas
+        self._contencoes = [0] * numero_faixas
+        self._espera = [0.0] * numero_faixas
+
+    def faixa(self, conta_id):
+        """Faixa da conta (hash do conta_id)"""
+        return hash(conta_id) % self.numero_faixas
+
+    @contextmanager
+    def travar(self, *contas_ids):
+        """Trava as faixas das contas, sempre em ordem crescente (sem deadlock entre operações de várias contas)"""
+        faixas = sorted({self.faixa(conta_id) for conta_id in contas_ids})
+        adquiridas = []
+        try:
+            for indice in faixas:
+                trava = self._faixas[indice]
+                if trava.acquire(blocking=False):
+                    espera = 0.0
+                else:
+                    inicio = time.perf_counter()
+                    trava.acquire()
+                    espera = time.perf_counter() - inicio
+                    self._contencoes[indice] += 1
+                    self._espera[indice] += espera
+                self._aquisicoes[indice] += 1
+                adquiridas.append(trava)
+            yield
+        finally:
+            for trava in reversed(adquiridas):
+                trava.release()
+
+    def estatisticas(self):
+        """Contadores de uso e contenção (totais e as faixas mais disputadas)"""
+        aquisicoes = sum(self._aquisicoes)
+        contencoes = sum(self._contencoes)
+        mais_disputadas = sorted(range(self.numero_faixas), key=lambda indice: self._contencoes[indice], reverse=True)
+        return {
+            'faixas': self.numero_faixas,
+            'aquisicoes': aquisicoes,
+            'contencoes': contencoes,
+            'taxa_contencao': round(contencoes / aquisicoes, 4) if aquisicoes else 0.0,
+            'espera_total_ms': round(sum(self._espera) * 1000, 3),
+            'faixas_mais_disputadas': [
+                {
+                    'faixa': indice,
+                    'aquisicoes': self._aquisicoes[indice],
+                    'contencoes': self._contencoes[indice],
+                    'espera_ms': round(self._espera[indice] * 1000, 3),
+                }
+                for indice in mais_disputadas[:5] if self._contencoes[indice]
+            ],
+        }
+
+    def zerar_estatisticas(self):
+        """Zera os contadores (ex.: no início de uma janela de monitoramento)"""
+        for indice in range(self.numero_faixas):
+            with self._faixas[indice]:
+                self._aquisicoes[indice] = 0
+                self._contencoes[indice] = 0
+                self._espera[indice] = 0.0